@@ -1,13 +1,35 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
+import logging
 import os
-from typing import Optional, Union
+import time
+from dataclasses import dataclass
+from typing import Optional, Union, Any, Callable, Awaitable, TypeVar
 
 from aiogram import Bot as _Bot
 from aiogram.bot.base import TelegramAPIServer, aiohttp, TELEGRAM_PRODUCTION
 from aiogram.types import base
 from pyrogram import Client, raw
+from pyrogram.errors import FloodWait
+
+from aiogram_tools._broadcast import Broadcast, BroadcastStats, ChatIds
+from aiogram_tools._sender import SendScheduler
+
+T = TypeVar('T')
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class GroupResult:
+    """Result of group provisioning by Userbot.create_groups."""
+    title: str
+    chat_id: Optional[int] = None
+    latency: float = 0.0
+    flood_waits: int = 0
+    error: Optional[Exception] = None
 
 
 class Userbot:
@@ -17,18 +39,57 @@ class Userbot:
             if not os.path.exists(folder):
                 os.mkdir(folder)
 
+        self.is_configured = api_id is not None and api_hash is not None
         self._client = Client(session_name, api_id, api_hash)
+        self._starting: Optional[asyncio.Task] = None
+        self._peers: dict[Union[int, str], Any] = {}
+        self._flood_until = 0.0
+
+    def start_in_background(self):
+        """Connect client in background task, so first call of client doesn't wait for it."""
+        if self._starting is None and not self._client.is_connected:
+            self._starting = asyncio.create_task(self._client.start())
 
     @property
     async def client(self) -> Client:
         if not self._client.is_connected:
-            await self._client.start()
+            self.start_in_background()
+            try:
+                await asyncio.shield(self._starting)
+            finally:
+                if self._starting.done():
+                    self._starting = None
         return self._client
 
     async def stop_client(self):
+        if self._starting is not None:
+            await asyncio.gather(self._starting, return_exceptions=True)
+            self._starting = None
         if self._client.is_connected:
             await self._client.stop()
 
+    async def resolve_peer(self, peer_id: Union[int, str]):
+        """Resolve peer once, then return cached one."""
+        peer = self._peers.get(peer_id)
+        if peer is None:
+            client = await self.client
+            peer = self._peers[peer_id] = await self._call(client.resolve_peer, peer_id)
+        return peer
+
+    async def _call(self, method: Callable[..., Awaitable[T]], *args, max_retries: int = 3) -> T:
+        """Call client method, wait and retry on FloodWait (pause is shared by all calls)."""
+        for attempt in itertools.count():
+            delay = self._flood_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                return await method(*args)
+            except FloodWait as e:
+                if attempt >= max_retries:
+                    raise
+                self._flood_until = max(self._flood_until, time.monotonic() + e.x)
+
     async def create_group(
             self,
             title: str,
@@ -40,18 +101,47 @@ class Userbot:
         if not isinstance(other_users, list):
             other_users = [other_users]
 
-        other_users.append(bound_bot)
-        new_group = await client.create_group(title, other_users)
+        other_users = [*other_users, bound_bot]
+        new_group = await self._call(client.create_group, title, other_users)
 
-        peer = await client.resolve_peer(new_group.id)
+        peer, bot_peer = await asyncio.gather(self._call(client.resolve_peer, new_group.id),
+                                              self.resolve_peer(bound_bot))
 
-        await client.send(
-            raw.functions.messages.EditChatAdmin(
-                chat_id=peer.chat_id,
-                user_id=await client.resolve_peer(bound_bot),
-                is_admin=True
-            )
-        )
+        await self._call(client.send, raw.functions.messages.EditChatAdmin(
+            chat_id=peer.chat_id,
+            user_id=bot_peer,
+            is_admin=True
+        ))
+        return new_group
+
+    async def create_groups(
+            self,
+            titles: list[str],
+            bound_bot: Union[int, str],
+            other_users: Union[Union[int, str], list[Union[int, str]]],
+            concurrency: int = 4,
+    ) -> list[GroupResult]:
+        """Create groups with at most `concurrency` groups being created at once.
+
+        Errors don't stop provisioning of other groups, they are returned in results.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        await self.client
+
+        async def provision(title: str) -> GroupResult:
+            result = GroupResult(title)
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    group = await self.create_group(title, bound_bot, other_users)
+                    result.chat_id = group.id
+                except Exception as e:
+                    result.error = e
+                    log.exception(f'Cause exception while creating group {title!r}')
+                result.latency = time.monotonic() - started
+            return result
+
+        return list(await asyncio.gather(*(provision(title) for title in titles)))
 
 
 class Bot(_Bot):
@@ -69,6 +159,7 @@ class Bot(_Bot):
             server: TelegramAPIServer = TELEGRAM_PRODUCTION,
             bound_userbot_api_id: Optional[int] = None,
             bound_userbot_api_hash: Optional[str] = None,
+            send_scheduler: Optional[SendScheduler] = None,
     ):
         super().__init__(
             token=token,
@@ -83,8 +174,55 @@ class Bot(_Bot):
         )
 
         self.bound_userbot = Userbot(bound_userbot_api_id, bound_userbot_api_hash)
+        self.send_scheduler = send_scheduler
+
+    async def request(self, method: base.String, data: Optional[dict] = None, files: Optional[dict] = None,
+                      **kwargs):
+        """Make request. Messages to chats are sent through send_scheduler, if it is set."""
+        scheduler = self.send_scheduler
+        if scheduler is None or not data or data.get('chat_id') is None or not scheduler.is_limited(method):
+            return await super().request(method, data, files, **kwargs)
+
+        send = super().request
+        return await scheduler.submit(data['chat_id'], lambda: send(method, data, files, **kwargs))
+
+    async def broadcast(self, chat_ids: ChatIds, text: Optional[base.String] = None, *,
+                        send: Optional[Callable[[Union[int, str]], Awaitable]] = None,
+                        workers: int = 20, rate: float = 30,
+                        checkpoint_path: Optional[str] = None,
+                        on_blocked: Optional[Callable[[Union[int, str]], Awaitable]] = None,
+                        on_progress: Optional[Callable[[BroadcastStats], Any]] = None,
+                        progress_interval: float = 5,
+                        **kwargs) -> BroadcastStats:
+        """Send text (kwargs are passed to send_message) or call send(chat_id) for each chat (see Broadcast)."""
+        if send is None:
+            async def send(chat_id):
+                return await self.send_message(chat_id, text, **kwargs)
+
+        broadcast = Broadcast(chat_ids, send, workers=workers, rate=rate, checkpoint_path=checkpoint_path,
+                              on_blocked=on_blocked, on_progress=on_progress,
+                              progress_interval=progress_interval)
+        return await broadcast.run()
+
+    def warm_up(self):
+        """Connect bound userbot in background (if its api_id and api_hash are passed)."""
+        if self.bound_userbot.is_configured:
+            self.bound_userbot.start_in_background()
+
+    async def close(self):
+        if self.send_scheduler is not None:
+            await self.send_scheduler.close()
+        await self.bound_userbot.stop_client()
+        await super().close()
 
     async def create_group(self, title: str, users: Union[Union[int, str], list[Union[int, str]]] = None):
         users = users or []
         bound_bot_username = (await self.me).username
         await self.bound_userbot.create_group(title, bound_bot_username, users)
+
+    async def create_groups(self, titles: list[str], users: Union[Union[int, str], list[Union[int, str]]] = None,
+                            concurrency: int = 4) -> list[GroupResult]:
+        """Create many groups concurrently (see Userbot.create_groups)."""
+        users = users or []
+        bound_bot_username = (await self.me).username
+        return await self.bound_userbot.create_groups(titles, bound_bot_username, users, concurrency)
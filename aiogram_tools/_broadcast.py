@@ -0,0 +1,216 @@
+"""Contain broadcast of messages to a stream of chats with checkpoints."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Union, Iterable, AsyncIterable, Callable, Awaitable, Optional, Any
+
+from aiogram.utils import exceptions
+
+from aiogram_tools._sender import TokenBucket, SendScheduler, Priority
+
+__all__ = ['Broadcast', 'BroadcastStats']
+
+log = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+ChatIds = Union[Iterable[ChatId], AsyncIterable[ChatId]]
+
+BLOCKED_ERRORS = (
+    exceptions.BotBlocked,
+    exceptions.BotKicked,
+    exceptions.UserDeactivated,
+    exceptions.ChatNotFound,
+    exceptions.CantInitiateConversation,
+)
+
+
+@dataclass
+class BroadcastStats:
+    position: int = 0  # all chats before position are processed
+    done_after: list[int] = field(default_factory=list)  # processed chats after position
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    retry_after: int = 0
+    elapsed: float = 0.0
+    finished: bool = False
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def throughput(self) -> float:
+        """Processed chats per second."""
+        if not self.elapsed:
+            return 0.0
+        return self.processed / self.elapsed
+
+
+class Broadcast:
+    """Send message to each chat of stream (iterable or async iterable, it isn't loaded into memory).
+
+    `workers` sends run concurrently, all of them share token bucket of `rate` messages per second.
+    RetryAfter pauses all workers. Chats which blocked bot are counted and passed to on_blocked.
+    If checkpoint_path is passed, progress is saved there, and next broadcast with this path skips
+    already processed chats (so stream must yield chats in same order).
+    Delivery is at-least-once: chats which were being sent when broadcast was stopped (or processed
+    after last save of checkpoint, if process crashed) are sent again on resume.
+    """
+
+    def __init__(self, chat_ids: ChatIds, send: Callable[[ChatId], Awaitable], *,
+                 workers: int = 20, rate: float = 30, max_retries: int = 3,
+                 checkpoint_path: Optional[str] = None,
+                 on_blocked: Optional[Callable[[ChatId], Awaitable]] = None,
+                 on_progress: Optional[Callable[[BroadcastStats], Any]] = None,
+                 progress_interval: float = 5):
+        self.chat_ids = chat_ids
+        self.send = send
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.checkpoint_path = checkpoint_path
+        self.on_blocked = on_blocked
+        self.on_progress = on_progress or self.log_progress
+        self.progress_interval = progress_interval
+
+        self.stats = self.load_checkpoint()
+        self._pending: set[int] = set()
+        self._done: set[int] = set(self.stats.done_after)
+        self._next_index = self.stats.position
+        self._paused_until = 0.0
+
+    @staticmethod
+    def log_progress(stats: BroadcastStats):
+        log.info(f'Broadcast: {stats.processed} processed ({stats.sent} sent, {stats.blocked} blocked, '
+                 f'{stats.failed} failed), {stats.throughput:.1f} chats/s')
+
+    def load_checkpoint(self) -> BroadcastStats:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return BroadcastStats()
+
+        with open(self.checkpoint_path) as file:
+            return BroadcastStats(**json.load(file))
+
+    def save_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(asdict(self.stats), file)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    async def run(self) -> BroadcastStats:
+        if self.stats.finished:
+            return self.stats
+
+        started = time.monotonic() - self.stats.elapsed
+        queue = asyncio.Queue(self.workers * 2)
+        workers = [asyncio.create_task(self._work(queue)) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report(started))
+
+        try:
+            await self._produce(queue)
+            await queue.join()
+            self.stats.finished = True
+        finally:
+            for task in (*workers, reporter):
+                task.cancel()
+            await asyncio.gather(*workers, reporter, return_exceptions=True)
+
+            self._update_progress(started)
+            self.save_checkpoint()
+            self.on_progress(self.stats)
+
+        return self.stats
+
+    async def _produce(self, queue: asyncio.Queue):
+        index = 0
+
+        if isinstance(self.chat_ids, AsyncIterable):
+            async for chat_id in self.chat_ids:
+                await self._put(queue, index, chat_id)
+                index += 1
+        else:
+            for chat_id in self.chat_ids:
+                await self._put(queue, index, chat_id)
+                index += 1
+
+    async def _put(self, queue: asyncio.Queue, index: int, chat_id: ChatId):
+        if index < self.stats.position or index in self._done:
+            return  # processed before resuming
+
+        await queue.put((index, chat_id))
+        self._pending.add(index)
+        self._next_index = index + 1
+
+    def _update_progress(self, started: float):
+        """Update checkpoint: position and processed chats after it (at most ~ 3 * workers)."""
+        position = min(self._pending, default=self._next_index)
+        self._done = {index for index in self._done if index >= position}
+
+        self.stats.position = position
+        self.stats.done_after = sorted(self._done)
+        self.stats.elapsed = time.monotonic() - started
+
+    async def _report(self, started: float):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self._update_progress(started)
+            self.save_checkpoint()
+            self.on_progress(self.stats)
+
+    async def _wait_turn(self):
+        while True:
+            delay = max(self.bucket.delay(), self._paused_until - time.monotonic())
+            if not delay:
+                self.bucket.consume()
+                return
+            await asyncio.sleep(delay)
+
+    async def _work(self, queue: asyncio.Queue):
+        stats = self.stats
+
+        while True:
+            index, chat_id = await queue.get()
+            try:
+                await self._send(chat_id)
+            except BLOCKED_ERRORS:
+                stats.blocked += 1
+                await self._blocked(chat_id)
+            except Exception as e:
+                stats.failed += 1
+                log.warning(f'Broadcast to {chat_id} failed: {e!r}')
+            else:
+                stats.sent += 1
+
+            # not on cancellation: interrupted chat stays pending in checkpoint
+            self._pending.discard(index)
+            self._done.add(index)
+            queue.task_done()
+
+    async def _blocked(self, chat_id: ChatId):
+        if self.on_blocked is None:
+            return
+        try:
+            await self.on_blocked(chat_id)
+        except Exception:
+            log.exception(f'Cause exception in on_blocked for {chat_id}')
+
+    async def _send(self, chat_id: ChatId):
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn()
+            try:
+                with SendScheduler.priority(Priority.BULK):
+                    return await self.send(chat_id)
+            except exceptions.RetryAfter as e:
+                self.stats.retry_after += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + e.timeout)
+                if attempt == self.max_retries:
+                    raise
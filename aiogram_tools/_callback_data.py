@@ -0,0 +1,171 @@
+"""Contain compact typed callback data: tag and fields packed to bytes, encoded by url-safe base64."""
+from __future__ import annotations
+
+import base64
+import struct
+import warnings
+from typing import Any, Optional, Callable
+
+__all__ = ['CallbackSchema', 'MAX_CALLBACK_DATA']
+
+MAX_CALLBACK_DATA = 64  # bytes, Telegram limit
+SEPARATOR = ':'  # not in base64 alphabet
+
+_DOUBLE = struct.Struct('>d')
+
+
+def _write_varint(buffer: bytearray, value: int):
+    value = (value << 1) ^ (value >> 63) if -2 ** 63 <= value < 2 ** 63 else None  # zigzag
+    if value is None:
+        raise ValueError('Integer is out of 64-bit range')
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return (result >> 1) ^ -(result & 1), pos
+        shift += 7
+
+
+def _write_bytes(buffer: bytearray, value: bytes):
+    _write_varint(buffer, len(value))
+    buffer += value
+
+
+def _read_bytes(data: bytes, pos: int) -> tuple[bytes, int]:
+    length, pos = _read_varint(data, pos)
+    end = pos + length
+    if end > len(data):
+        raise ValueError('Truncated callback data')
+    return data[pos:end], end
+
+
+def _encode(buffer: bytearray, field_type: type, value: Any):
+    if field_type is bool:
+        buffer.append(1 if value else 0)
+    elif field_type is int:
+        _write_varint(buffer, int(value))
+    elif field_type is float:
+        buffer += _DOUBLE.pack(value)
+    elif field_type is str:
+        _write_bytes(buffer, value.encode())
+    elif field_type is bytes:
+        _write_bytes(buffer, value)
+
+
+def _read_bool(data: bytes, pos: int) -> tuple[bool, int]:
+    return bool(data[pos]), pos + 1
+
+
+def _read_float(data: bytes, pos: int) -> tuple[float, int]:
+    return _DOUBLE.unpack_from(data, pos)[0], pos + _DOUBLE.size
+
+
+def _read_str(data: bytes, pos: int) -> tuple[str, int]:
+    value, pos = _read_bytes(data, pos)
+    return value.decode(), pos
+
+
+_DECODERS: dict[type, Callable[[bytes, int], tuple[Any, int]]] = {
+    bool: _read_bool,
+    int: _read_varint,
+    float: _read_float,
+    str: _read_str,
+    bytes: _read_bytes,
+}
+
+
+class CallbackSchema:
+    """Typed callback data: `tag:<base64 of packed fields>`.
+
+        item_cb = CallbackSchema('item', id=int, page=int)
+        InlineButton.with_data('Item', item_cb, id=5, page=2)
+
+        @dp.callback_query_handler(button=item_cb)
+        async def show_item(query, button: dict): ...  # button == {'id': 5, 'page': 2}
+
+    Supported field types: int, str, bool, float, bytes.
+    """
+
+    FIELD_TYPES = tuple(_DECODERS)
+
+    registry: dict[str, CallbackSchema] = {}
+
+    def __init__(self, tag: str, **fields: type):
+        if not tag or SEPARATOR in tag:
+            raise ValueError(f'Tag must be non-empty and must not contain {SEPARATOR!r}')
+        for name, field_type in fields.items():
+            if field_type not in self.FIELD_TYPES:
+                raise TypeError(f'Unsupported type of field {name!r}: {field_type!r}')
+
+        self.tag = tag
+        self.prefix = f'{tag}{SEPARATOR}'
+        self.fields: dict[str, type] = fields
+        self._decoders = [(name, _DECODERS[field_type]) for name, field_type in fields.items()]
+
+        if tag in self.registry:
+            warnings.warn(f'Callback schema tag {tag!r} is not unique')
+        self.registry[tag] = self
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={field_type.__name__}' for name, field_type in self.fields.items())
+        return f'{type(self).__name__}({self.tag!r}, {fields})'
+
+    def pack(self, **values) -> str:
+        """Return callback data with values of all fields."""
+        buffer = bytearray()
+        for name, field_type in self.fields.items():
+            try:
+                value = values[name]
+            except KeyError:
+                raise ValueError(f'Missing value of field {name!r}') from None
+            _encode(buffer, field_type, value)
+
+        data = self.prefix + base64.urlsafe_b64encode(buffer).rstrip(b'=').decode()
+        if len(data.encode()) > MAX_CALLBACK_DATA:
+            raise ValueError(f'Callback data is longer than {MAX_CALLBACK_DATA} bytes: {data!r}')
+        return data
+
+    def unpack(self, data: str) -> Optional[dict[str, Any]]:
+        """Return values of fields or None if data is not of this schema."""
+        if not data.startswith(self.prefix):
+            return None
+
+        encoded = data[len(self.prefix):]
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            values = {}
+            pos = 0
+            for name, decode in self._decoders:
+                values[name], pos = decode(raw, pos)
+        except (ValueError, IndexError, struct.error, UnicodeDecodeError):
+            return None
+
+        if pos != len(raw):
+            return None
+        return values
+
+    @staticmethod
+    def get_tag(data: str) -> Optional[str]:
+        """Return tag of data (it can be of any schema or not of schema at all)."""
+        tag, separator, _ = data.partition(SEPARATOR)
+        return tag if separator else None
+
+    @classmethod
+    def unpack_any(cls, data: str) -> Optional[tuple[CallbackSchema, dict[str, Any]]]:
+        """Find schema of data by tag and return it with values."""
+        schema = cls.registry.get(cls.get_tag(data))
+        if schema is None:
+            return None
+        values = schema.unpack(data)
+        if values is None:
+            return None
+        return schema, values
@@ -0,0 +1,347 @@
+"""Contain runner of one bot in several processes with routing of updates by chat."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field
+from multiprocessing.connection import Connection
+from typing import Callable, Optional, Any
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+
+__all__ = ['Cluster', 'ClusterStats', 'get_chat_id']
+
+log = logging.getLogger(__name__)
+
+DispatcherFactory = Callable[[], Dispatcher]
+
+
+def get_chat_id(raw_update: dict) -> int:
+    """Return chat id (or user id) of raw update, update_id for updates without them.
+
+    Same as UpdatesEngine.get_shard_key, but without parsing of update.
+    """
+    for kind, obj in raw_update.items():
+        if not isinstance(obj, dict):
+            continue
+
+        chat = obj.get('chat') or (obj.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+
+        user = obj.get('from') or obj.get('user')
+        if user:
+            return user['id']
+
+    return raw_update['update_id']
+
+
+STOP = b''  # sent to worker instead of batch to stop it
+
+# --- worker process ---
+
+def _run_worker(factory: DispatcherFactory, conn: Connection, workers: int, queue_size: int,
+                stats_interval: float):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # supervisor stops workers by STOP message
+    asyncio.run(_serve_worker(factory, conn, workers, queue_size, stats_interval))
+
+
+async def _serve_worker(factory: DispatcherFactory, conn: Connection, workers: int, queue_size: int,
+                        stats_interval: float):
+    dp = factory()
+    Dispatcher.set_current(dp)
+    Bot.set_current(dp.bot)
+
+    engine = dp.engine or dp.setup_engine(workers, queue_size)
+    engine.start()
+    warm_up = getattr(dp, '_warm_up_bot', None)
+    if warm_up is not None:
+        await warm_up()
+
+    loop = asyncio.get_running_loop()
+    batches: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=16)
+
+    def read():
+        """Read batches in thread, block it while queue is full (so sender is blocked too)."""
+        while True:
+            try:
+                data = conn.recv_bytes() or None
+            except (EOFError, OSError):
+                data = None
+            asyncio.run_coroutine_threadsafe(batches.put(data), loop).result()
+            if data is None:
+                return
+
+    async def report():
+        while True:
+            await asyncio.sleep(stats_interval)
+            stats = {**asdict(engine.stats), 'queue_depth': engine.queue_depth}
+            try:
+                conn.send_bytes(json.dumps(stats).encode())
+            except OSError:
+                return
+
+    threading.Thread(target=read, name='cluster_reader', daemon=True).start()
+    reporter = asyncio.create_task(report())
+
+    try:
+        while True:
+            data = await batches.get()
+            if data is None:
+                break
+            for raw_update in json.loads(data):
+                await engine.put(types.Update(**raw_update))
+    finally:
+        reporter.cancel()
+        await engine.close()
+        await dp.bot.session.close()
+        conn.close()
+
+
+# --- supervisor process ---
+
+@dataclass
+class ClusterStats:
+    received: int = 0
+    lost: int = 0  # updates which weren't sent to worker because it was dead
+    restarts: int = 0
+    routed: list[int] = field(default_factory=list)  # updates sent to each worker
+    workers: list[dict] = field(default_factory=list)  # last stats reported by each worker
+
+    def aggregate(self) -> dict[str, float]:
+        """Sum numeric stats of workers (max_* values are maximums)."""
+        total = {}
+        for worker_stats in self.workers:
+            for key, value in worker_stats.items():
+                if key.startswith('max_'):
+                    total[key] = max(total.get(key, 0), value)
+                else:
+                    total[key] = total.get(key, 0) + value
+        return total
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.conn: Optional[Connection] = None
+        # one thread keeps order of batches sent to worker
+        self.sender = ThreadPoolExecutor(1, thread_name_prefix=f'cluster_sender_{index}')
+
+
+class Cluster:
+    """Run bot in `processes` worker processes, each with own Dispatcher (and Bot session) made by `factory`.
+
+    Front (this process) receives updates by polling or webhook and sends each to worker
+    by hash of its chat id, so updates of one chat are processed by one process in order.
+    Inside worker updates are processed by Dispatcher.engine. Crashed workers are restarted
+    (updates sent to crashed worker, but not processed, are lost). Workers report stats
+    every `stats_interval` seconds, see `stats` and `stats.aggregate()`.
+
+    factory must be picklable (function of module): workers are spawned, not forked.
+    Front calls it too, to get Bot for receiving updates.
+    """
+
+    def __init__(self, factory: DispatcherFactory, processes: Optional[int] = None, *,
+                 workers: int = 16, queue_size: int = 1000, stats_interval: float = 5,
+                 restart_delay: float = 1):
+        self.factory = factory
+        self.processes = processes or multiprocessing.cpu_count()
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stats_interval = stats_interval
+        self.restart_delay = restart_delay
+
+        self.stats = ClusterStats(routed=[0] * self.processes, workers=[{} for _ in range(self.processes)])
+
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = [_Worker(index) for index in range(self.processes)]
+        self._running = False
+        self._watchers: list[asyncio.Task] = []
+
+    # --- workers ---
+
+    def _start_worker(self, worker: _Worker):
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self.factory, child_conn, self.workers, self.queue_size, self.stats_interval),
+            name=f'bot_worker_{worker.index}',
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        worker.process, worker.conn = process, conn
+        threading.Thread(target=self._read_stats, args=(worker, conn), daemon=True).start()
+
+    def _read_stats(self, worker: _Worker, conn: Connection):
+        """Read stats of worker until it exits, then close connection (it's closed by this thread only)."""
+        while True:
+            try:
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                conn.close()
+                return
+            self.stats.workers[worker.index] = json.loads(data)
+
+    async def _watch(self, worker: _Worker):
+        """Restart worker when its process exits."""
+        loop = asyncio.get_running_loop()
+
+        while self._running:
+            exited = loop.create_future()
+            loop.add_reader(worker.process.sentinel, exited.set_result, None)
+            try:
+                await exited
+            finally:
+                loop.remove_reader(worker.process.sentinel)
+
+            if not self._running:
+                return
+
+            await loop.run_in_executor(None, worker.process.join)
+            log.warning(f'Worker {worker.index} exited with code {worker.process.exitcode}, restarting')
+            self.stats.restarts += 1
+            await asyncio.sleep(self.restart_delay)
+            self._start_worker(worker)
+
+    def start(self):
+        self._running = True
+        for worker in self._workers:
+            self._start_worker(worker)
+            self._watchers.append(asyncio.create_task(self._watch(worker)))
+
+    async def close(self, timeout: float = 30):
+        """Stop workers: they process received updates and exit."""
+        self._running = False
+        for task in self._watchers:
+            task.cancel()
+        self._watchers.clear()
+
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            with contextlib.suppress(OSError):
+                await loop.run_in_executor(worker.sender, worker.conn.send_bytes, STOP)
+        for worker in self._workers:
+            await loop.run_in_executor(None, worker.process.join, timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.sender.shutdown()
+
+    # --- routing ---
+
+    async def route(self, raw_updates: list[dict]):
+        """Send updates to workers, return when all of them are sent (or lost)."""
+        batches: dict[int, list[dict]] = {}
+        for raw_update in raw_updates:
+            index = hash(get_chat_id(raw_update)) % self.processes
+            batches.setdefault(index, []).append(raw_update)
+
+        self.stats.received += len(raw_updates)
+        await asyncio.gather(*(self._send(self._workers[index], batch) for index, batch in batches.items()))
+
+    async def _send(self, worker: _Worker, batch: list[dict]):
+        data = json.dumps(batch).encode()
+        conn = worker.conn
+        try:
+            await asyncio.get_running_loop().run_in_executor(worker.sender, conn.send_bytes, data)
+        except OSError:
+            self.stats.lost += len(batch)
+            log.warning(f'Worker {worker.index} is dead, {len(batch)} updates are lost')
+        else:
+            self.stats.routed[worker.index] += len(batch)
+
+    # --- ingestion ---
+
+    def _make_bot(self) -> Bot:
+        return self.factory().bot
+
+    async def poll(self, bot: Bot, timeout: int = 20, limit: int = 100, error_sleep: float = 5):
+        """Receive raw updates by getUpdates until cancelled, offset covers updates sent to workers."""
+        offset = None
+        while self._running:
+            payload = {'limit': limit, 'timeout': timeout}
+            if offset is not None:
+                payload['offset'] = offset
+
+            try:
+                with bot.request_timeout(timeout + 10):
+                    raw_updates = await bot.request('getUpdates', payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception('Cause exception while getting updates.')
+                await asyncio.sleep(error_sleep)
+                continue
+
+            if raw_updates:
+                await self.route(raw_updates)
+                offset = raw_updates[-1]['update_id'] + 1
+
+    def make_webhook_app(self, webhook_path: str) -> web.Application:
+        """Return app which answers 200 as soon as update is sent to worker."""
+
+        async def receive(request: web.Request) -> web.Response:
+            await self.route([await request.json()])
+            return web.Response(text='ok')
+
+        app = web.Application()
+        app.router.add_post(webhook_path, receive)
+        return app
+
+    def run_polling(self, *, timeout: int = 20, limit: int = 100, reset_webhook: bool = True):
+        async def main():
+            bot = self._make_bot()
+            if reset_webhook:
+                await bot.delete_webhook()
+            self.start()
+            try:
+                await self.poll(bot, timeout, limit)
+            finally:
+                await self.close()
+                await bot.session.close()
+
+        self._run(main())
+
+    def run_webhook(self, webhook_host: str, webhook_path: str, *, host: str = '0.0.0.0', port: int = 8080,
+                    max_connections: Optional[int] = None, **set_webhook_kwargs: Any):
+        async def main():
+            bot = self._make_bot()
+            await bot.set_webhook(webhook_host + webhook_path, max_connections=max_connections,
+                                  **set_webhook_kwargs)
+            self.start()
+
+            runner = web.AppRunner(self.make_webhook_app(webhook_path))
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await runner.cleanup()
+                await self.close()
+                await bot.session.close()
+
+        self._run(main())
+
+    @staticmethod
+    def _run(main):
+        async def serve():
+            # SIGTERM stops cluster as Ctrl+C does
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+            await main
+
+        started = time.monotonic()
+        try:
+            asyncio.run(serve())
+        except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
+            pass
+        log.warning(f'Cluster is stopped after {time.monotonic() - started:.0f}s')
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import functools
 import inspect
+from contextvars import ContextVar
 from typing import Optional, Any, Awaitable, Callable
 
 from aiogram import types, Dispatcher as Dispatcher, Bot as Bot
@@ -31,26 +33,103 @@ async def get_state(obj: Dispatcher) -> Optional[State]:
 
 class ContextObj:
 
-    def __init__(self, ctx_type: type[ContextInstanceMixin], get_target: callable = lambda x: x):
+    def __init__(self, ctx_type: type[ContextInstanceMixin], get_target: callable = lambda x: x, memoize=False):
+        """
+        :param memoize: resolve awaitable target once per update
+        """
         self.ctx_type = ctx_type
         self.get_target = get_target
+        self.memoize = memoize
 
-    async def get_current(self) -> Optional[Any]:
+    def get_target_or_awaitable(self) -> Optional[Any]:
+        """Return target or awaitable (which must be passed to await_target)."""
         try:
-            obj = self.ctx_type.get_current()
-
-            target = self.get_target(obj)
-            if inspect.isawaitable(target):
-                target = await target
+            return self.get_target(self.ctx_type.get_current())
+        except AttributeError:
+            return None
 
-            return target
+    @staticmethod
+    async def await_target(target: Awaitable) -> Optional[Any]:
+        try:
+            return await target
         except AttributeError:
             return None
 
+    async def get_current(self) -> Optional[Any]:
+        target = self.get_target_or_awaitable()
+        if inspect.isawaitable(target):
+            target = await self.await_target(target)
+        return target
+
     def __repr__(self):
         return f'{type(self).__name__}(type={self.ctx_type.__name__}, target={self.get_target.__name__})'
 
 
+_memo: ContextVar[tuple[Optional[types.Update], dict[ContextObj, Any]]] = ContextVar('current_objects_memo')
+
+
+def _get_update_memo() -> dict[ContextObj, Any]:
+    """Return memoized targets for current update."""
+    update = types.Update.get_current()
+    memo = _memo.get(None)
+
+    if memo is None or memo[0] is not update:
+        memo = (update, {})
+        _memo.set(memo)
+    return memo[1]
+
+
+class InjectionPlan:
+    """ContextObj for each function argument, which can be resolved by CurrentObjects."""
+
+    def __init__(self, objects: type[CurrentObjects], args: list[str]):
+        self.version = objects.version
+        keywords = objects.keywords
+        self.providers: tuple[tuple[str, ContextObj], ...] = tuple(
+            (arg, getattr(objects, arg)) for arg in args if arg in keywords
+        )
+
+    async def resolve(self, skip: dict) -> dict[str, Any]:
+        """Return current objects for arguments not in skip. Awaitable targets are resolved concurrently."""
+        resolved = {}
+        awaiting_args = []
+        awaiting = []
+        memo = None
+
+        for arg, ctx_obj in self.providers:
+            if arg in skip:
+                continue
+
+            if ctx_obj.memoize:
+                if memo is None:
+                    memo = _get_update_memo()
+                if ctx_obj in memo:
+                    resolved[arg] = memo[ctx_obj]
+                    continue
+
+            target = ctx_obj.get_target_or_awaitable()
+            if inspect.isawaitable(target):
+                awaiting_args.append((arg, ctx_obj))
+                awaiting.append(ctx_obj.await_target(target))
+            else:
+                resolved[arg] = target
+
+        if not awaiting:
+            return resolved
+
+        if len(awaiting) == 1:
+            targets = [await awaiting[0]]
+        else:
+            targets = await asyncio.gather(*awaiting)
+
+        for (arg, ctx_obj), target in zip(awaiting_args, targets):
+            resolved[arg] = target
+            if ctx_obj.memoize:
+                memo[ctx_obj] = target
+
+        return resolved
+
+
 class CurrentObjects:
     """Context telegram objects and derivatives.
     You can specify own objects and aliases at runtime.
@@ -109,10 +188,18 @@ class CurrentObjects:
     idata = ContextObj(types.InlineQuery, lambda obj: obj.query)
     iquery_id = ContextObj(types.InlineQuery, lambda obj: obj.id)
 
+    # incremented on changes by set_alias/set_ctx_obj, so injection plans are rebuilt
+    version = 0
+    _keywords: tuple[int, set[str]] = (-1, set())
+
     @classmethod
     @property
     def keywords(cls) -> set[str]:
-        return {k for k, v in vars(cls).items() if isinstance(v, ContextObj)}
+        version, keywords = cls._keywords
+        if version != cls.version or '_keywords' not in vars(cls):
+            keywords = {k for k, v in vars(cls).items() if isinstance(v, ContextObj)}
+            cls._keywords = (cls.version, keywords)
+        return keywords
 
     @classmethod
     async def get(cls, ctx_obj: str) -> Optional[Any]:
@@ -123,14 +210,31 @@ class CurrentObjects:
     @classmethod
     def set_alias(cls, ctx_obj: str, alias: str):
         setattr(cls, alias, getattr(cls, ctx_obj))
+        cls.version += 1
+
+    @classmethod
+    def set_ctx_obj(cls, name: str, ctx_obj: type[ContextInstanceMixin], get_target: callable = lambda x: x,
+                    memoize=False):
+        setattr(cls, name, ContextObj(ctx_obj, get_target, memoize))
+        cls.version += 1
 
     @classmethod
-    def set_ctx_obj(cls, name: str, ctx_obj: type[ContextInstanceMixin], get_target: callable = lambda x: x):
-        setattr(cls, name, ContextObj(ctx_obj, get_target))
+    def _make_plan_getter(cls, args: list[str]) -> Callable[[], InjectionPlan]:
+        plan = InjectionPlan(cls, args)
+
+        def get_plan() -> InjectionPlan:
+            nonlocal plan
+            if plan.version != cls.version:
+                plan = InjectionPlan(cls, args)
+            return plan
+
+        return get_plan
 
     @classmethod
     def decorate_handler(cls, handler) -> callable:
         """Now handler will receive current objects only according it's signature."""
+        spec_args = inspect.getfullargspec(handler).args
+        get_plan = cls._make_plan_getter(spec_args)
 
         @functools.wraps(handler)
         async def wrapper(*args, **kwargs):
@@ -138,14 +242,8 @@ class CurrentObjects:
                 if isinstance(arg, types.Update):
                     types.Update.set_current(arg)
 
-            resolved_kwargs = {}
-            spec_args = inspect.getfullargspec(handler).args
-
-            for arg in spec_args:
-                if arg in kwargs:
-                    resolved_kwargs[arg] = kwargs[arg]
-                elif arg in cls.keywords:
-                    resolved_kwargs[arg] = await cls.get(arg)
+            resolved_kwargs = {arg: kwargs[arg] for arg in spec_args if arg in kwargs}
+            resolved_kwargs.update(await get_plan().resolve(skip=resolved_kwargs))
             return await handler(**resolved_kwargs)
 
         return wrapper
@@ -153,16 +251,11 @@ class CurrentObjects:
     @classmethod
     def decorate(cls, func) -> Callable[..., Awaitable]:
         """Now func will receive current objects for missing args (kwargs only)."""
+        get_plan = cls._make_plan_getter(inspect.getfullargspec(func).kwonlyargs)
 
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-
-            spec_kwargs = inspect.getfullargspec(func).kwonlyargs
-
-            for arg in spec_kwargs:
-                if arg not in kwargs:
-                    if arg in cls.keywords:
-                        kwargs[arg] = await cls.get(arg)
+            kwargs.update(await get_plan().resolve(skip=kwargs))
 
             result = func(*args, **kwargs)
 
@@ -0,0 +1,271 @@
+"""Contain engine for concurrent processing of updates with ordering per chat."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram import types
+from aiogram.dispatcher.webhook import WebhookRequestHandler, RESPONSE_TIMEOUT
+from aiohttp import web
+
+__all__ = ['UpdatesEngine', 'EngineStats', 'UpdateIdWindow', 'EngineRequestHandler', 'FastAckRequestHandler',
+           'get_chat_key']
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class EngineStats:
+    processed: int = 0
+    failed: int = 0
+    duplicates: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    dated: int = 0
+    total_lag: float = 0.0
+    max_lag: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        """Average time (in seconds) between enqueuing and processing of update."""
+        if not self.processed:
+            return 0.0
+        return self.total_wait / self.processed
+
+    @property
+    def avg_latency(self) -> float:
+        """Average time (in seconds) between enqueuing and end of processing of update."""
+        if not self.processed:
+            return 0.0
+        return self.total_latency / self.processed
+
+    @property
+    def avg_lag(self) -> float:
+        """Average end-to-end lag (in seconds): from date of message (as Telegram set it) to end of processing.
+
+        Only updates with date are counted (messages, posts, chat member updates), precision is one second.
+        """
+        if not self.dated:
+            return 0.0
+        return self.total_lag / self.dated
+
+
+class UpdateIdWindow:
+    """Sliding window of seen update_ids stored as bits of int.
+
+    update_id older than window is considered seen (Telegram redelivers recent updates only).
+    """
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self._base: Optional[int] = None
+        self._bits = 0
+
+    def add(self, update_id: int) -> bool:
+        """Mark update_id as seen, return False if it was seen already."""
+        if self._base is None:
+            self._base = update_id - self.size + 1
+
+        offset = update_id - self._base
+        if offset < 0:
+            return False
+
+        if offset >= self.size:
+            shift = offset - self.size + 1
+            self._bits >>= shift
+            self._base += shift
+            offset -= shift
+
+        mask = 1 << offset
+        if self._bits & mask:
+            return False
+        self._bits |= mask
+        return True
+
+
+def get_chat_key(dispatcher, update: types.Update) -> Optional[int]:
+    """Return chat id (or user id) of update, None for updates without them."""
+    resolved = dispatcher.resolve_update(update)
+    if resolved is None:
+        return None
+
+    obj, (_, context) = resolved
+    ids = {}
+
+    for ctx_type, get_target in context:
+        if ctx_type is types.Chat or ctx_type is types.User:
+            target = obj if get_target is None else get_target(obj)
+            if target is not None:
+                ids[ctx_type] = target.id
+
+    return ids.get(types.Chat, ids.get(types.User))
+
+
+def get_update_date(update: types.Update) -> Optional[float]:
+    """Return timestamp of event of update, if Telegram sent it."""
+    for obj in update.values.values():
+        date = getattr(obj, 'edit_date', None) or getattr(obj, 'date', None)
+        if date is not None:
+            return date.timestamp()
+
+
+class UpdatesEngine:
+    """Process updates with bounded pool of workers.
+
+    Updates are sharded by chat (or user) id: updates of one chat are processed in order,
+    updates of different chats - concurrently. Each worker has own bounded queue,
+    so enqueuing waits when worker is overloaded (backpressure).
+    With `dedup_window`, redelivered updates (same update_id) are skipped.
+    """
+
+    def __init__(self, dispatcher, workers: int = 16, queue_size: int = 1000, dedup_window: int = 0):
+        self.dispatcher = dispatcher
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stats = EngineStats()
+        self.seen_updates = UpdateIdWindow(dedup_window) if dedup_window else None
+
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self._submit_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of updates waiting for processing."""
+        return sum(queue.qsize() for queue in self._queues)
+
+    def start(self):
+        if self.is_running:
+            return
+
+        shard_size = max(1, self.queue_size // self.workers)
+        for _ in range(self.workers):
+            queue = asyncio.Queue(shard_size)
+            self._queues.append(queue)
+            self._tasks.append(asyncio.create_task(self._work(queue)))
+
+    async def close(self):
+        """Wait for enqueued updates and stop workers."""
+        for queue in self._queues:
+            await queue.join()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._tasks.clear()
+        self._queues.clear()
+
+    def get_shard_key(self, update: types.Update) -> int:
+        """Return chat id (or user id) of update, update_id for updates without them."""
+        key = get_chat_key(self.dispatcher, update)
+        return update.update_id if key is None else key
+
+    async def put(self, update: types.Update, future: Optional[asyncio.Future] = None) -> bool:
+        """Enqueue update, wait if queue of its shard is full. Return False if update is duplicate."""
+        if self.seen_updates is not None and not self.seen_updates.add(update.update_id):
+            self.stats.duplicates += 1
+            return False
+
+        self.start()
+
+        queue = self._queues[hash(self.get_shard_key(update)) % self.workers]
+        await queue.put((update, future, time.monotonic()))
+        return True
+
+    async def submit(self, update: types.Update) -> asyncio.Future:
+        """Enqueue update and return future with results of processing (None for duplicate)."""
+        future = asyncio.get_running_loop().create_future()
+        if not await self.put(update, future):
+            future.set_result(None)
+        return future
+
+    async def submit_many(self, updates: list[types.Update]) -> list[asyncio.Future]:
+        """Enqueue updates one by one and return their futures, updates of concurrent calls don't interleave."""
+        if self._submit_lock is None:
+            self._submit_lock = asyncio.Lock()
+
+        async with self._submit_lock:
+            return [await self.submit(update) for update in updates]
+
+    async def _work(self, queue: asyncio.Queue):
+        stats = self.stats
+
+        while True:
+            update, future, put_time = await queue.get()
+
+            wait = time.monotonic() - put_time
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+
+            try:
+                # separate task gives each update clean context (as aiogram does)
+                result = await asyncio.ensure_future(self.dispatcher.updates_handler.notify(update))
+            except Exception as e:
+                stats.failed += 1
+                if future is None:
+                    log.exception(f'Cause exception while processing update {update.update_id}')
+                elif not future.done():
+                    future.set_exception(e)
+            else:
+                if future is not None and not future.done():
+                    future.set_result(result)
+            finally:
+                stats.processed += 1
+                self._record_latency(update, put_time)
+                queue.task_done()
+
+    def _record_latency(self, update: types.Update, put_time: float):
+        stats = self.stats
+
+        latency = time.monotonic() - put_time
+        stats.total_latency += latency
+        stats.max_latency = max(stats.max_latency, latency)
+
+        date = get_update_date(update)
+        if date is not None:
+            lag = max(0.0, time.time() - date)
+            stats.dated += 1
+            stats.total_lag += lag
+            stats.max_lag = max(stats.max_lag, lag)
+
+
+class EngineRequestHandler(WebhookRequestHandler):
+    """Webhook handler which processes updates with Dispatcher.engine."""
+
+    async def process_update(self, update):
+        dispatcher = self.get_dispatcher()
+        future = await dispatcher.engine.submit(update)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            future.add_done_callback(self.respond_via_request)
+
+
+class FastAckRequestHandler(WebhookRequestHandler):
+    """Webhook handler which answers 200 as soon as update is enqueued to Dispatcher.engine.
+
+    Slow handlers don't hold connections of Telegram, but can't answer through webhook response.
+    """
+
+    async def post(self):
+        self.validate_ip()
+
+        dispatcher = self.get_dispatcher()
+        update = await self.parse_update(dispatcher.bot)
+        await dispatcher.engine.put(update)
+
+        web_response = web.Response(text='ok')
+        if self.request.app.get('RETRY_AFTER', None):
+            web_response.headers['Retry-After'] = self.request.app['RETRY_AFTER']
+        return web_response
@@ -0,0 +1,118 @@
+"""Contain FSMContext which reads state and data once per update and writes only changes."""
+from __future__ import annotations
+
+import asyncio
+import copy
+from contextvars import ContextVar
+from typing import Optional, AnyStr
+
+from aiogram.dispatcher import FSMContext
+
+__all__ = ['UpdateFSMContext', 'current_fsm_context']
+
+NOT_LOADED = object()
+
+current_fsm_context: ContextVar[Optional[UpdateFSMContext]] = ContextVar('current_fsm_context', default=None)
+
+
+class UpdateFSMContext(FSMContext):
+    """FSMContext for processing of single update (unit of work).
+
+    State and data are loaded from storage on first read, then all reads and writes are served from memory.
+    Changes are written to storage by flush(): changed keys only, whole data only if some keys were deleted.
+    Dispatcher flushes context only if update is processed without exception, otherwise changes are discarded.
+    """
+
+    def __init__(self, storage, chat, user):
+        super().__init__(storage, chat, user)
+
+        self._state = self._stored_state = NOT_LOADED
+        self._data: Optional[dict] = None
+        self._stored_data: Optional[dict] = None
+
+    def is_address(self, chat, user) -> bool:
+        """Check if context is for passed chat and user (None means current)."""
+        return (chat is None or chat == self.chat) and (user is None or user == self.user)
+
+    async def _load_state(self):
+        if self._stored_state is NOT_LOADED:
+            self._stored_state = await self.storage.get_state(chat=self.chat, user=self.user)
+            if self._state is NOT_LOADED:
+                self._state = self._stored_state
+
+    async def _load_data(self):
+        if self._stored_data is None:
+            self._stored_data = await self.storage.get_data(chat=self.chat, user=self.user) or {}
+            if self._data is None:
+                self._data = copy.deepcopy(self._stored_data)
+
+    async def get_state(self, default: Optional[str] = None) -> Optional[str]:
+        await self._load_state()
+        if self._state is None:
+            return self._resolve_state(default)
+        return self._state
+
+    async def get_data(self, default: Optional[dict] = None) -> dict:
+        """Return copy of data, copy of default if data is empty (as storages do)."""
+        await self._load_data()
+        if not self._data:
+            return copy.deepcopy(default) if default else {}
+        return copy.deepcopy(self._data)
+
+    async def update_data(self, data: dict = None, **kwargs):
+        await self._load_data()
+        if data:
+            self._data.update(copy.deepcopy(data))
+        self._data.update(copy.deepcopy(kwargs))
+
+    async def set_state(self, state: Optional[AnyStr] = None):
+        self._state = self._resolve_state(state)
+
+    async def set_data(self, data: dict = None):
+        self._data = copy.deepcopy(data) if data else {}
+
+    async def reset_state(self, with_data: Optional[bool] = True):
+        await self.set_state(None)
+        if with_data:
+            await self.set_data({})
+
+    async def reset_data(self):
+        await self.set_data({})
+
+    async def finish(self):
+        await self.reset_state(with_data=True)
+
+    async def flush(self):
+        """Write changed state and data to storage.
+
+        If both are changed, they are written by one set_record (storages with one record per address,
+        e.g. RedisStorage) or concurrently (separate keys), so flush takes one round trip.
+        """
+        writes = []
+
+        if self._state is not NOT_LOADED and self._state != self._stored_state:
+            writes.append(self._write_state)
+        if self._data is not None and self._data != self._stored_data:
+            writes.append(self._write_data)
+
+        if len(writes) == 2 and hasattr(self.storage, 'set_record'):
+            record = await self.storage.get_record(chat=self.chat, user=self.user)
+            await self.storage.set_record(chat=self.chat, user=self.user, state=self._state, data=self._data,
+                                          bucket=record.get('bucket'))
+        else:
+            await asyncio.gather(*(write() for write in writes))
+
+        self._stored_state = self._state
+        if self._data is not None:
+            self._stored_data = copy.deepcopy(self._data)
+
+    async def _write_state(self):
+        await self.storage.set_state(chat=self.chat, user=self.user, state=self._state)
+
+    async def _write_data(self):
+        if self._stored_data is None or self._stored_data.keys() - self._data.keys():
+            await self.storage.set_data(chat=self.chat, user=self.user, data=self._data)
+        else:
+            changed = {key: value for key, value in self._data.items()
+                       if key not in self._stored_data or self._stored_data[key] != value}
+            await self.storage.update_data(chat=self.chat, user=self.user, data=changed)
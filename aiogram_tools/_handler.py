@@ -0,0 +1,204 @@
+"""Contain Handler which finds handlers with button filter by index instead of checking them one by one."""
+from __future__ import annotations
+
+import re
+import time
+from operator import itemgetter
+from typing import Optional, Any
+
+from aiogram.dispatcher.filters import check_filters, FilterNotPassed
+from aiogram.dispatcher.handler import Handler, FilterObj, ctx_data, current_handler, _check_spec
+from aiogram.dispatcher.handler import SkipHandler, CancelHandler
+
+from aiogram_tools._callback_data import CallbackSchema
+from aiogram_tools.filters import _ButtonFilter, literal_prefix
+
+__all__ = ['ButtonsIndex', 'ButtonsHandler']
+
+# (position in Handler.handlers, handler object, filters to check, `button` data or None)
+Candidate = tuple[int, Handler.HandlerObj, list[FilterObj], Optional[dict]]
+
+
+class ButtonsIndex:
+    """Index of handlers with button filter.
+
+    Literal buttons and CallbackSchema buttons (by tag) are found by hash lookup, templated - by their literal prefix.
+    Handlers without button filter are candidates for any update.
+    """
+
+    def __init__(self, handlers: list[Handler.HandlerObj]):
+        self.cast_update = None
+        self.plain: list[Candidate] = []
+        self.buttons: dict[int, tuple[Handler.HandlerObj, list[FilterObj]]] = {}
+
+        self.exact: dict[str, list[tuple[int, int]]] = {}
+        self.tags: dict[str, list[tuple[int, int, CallbackSchema]]] = {}
+        self.templates: dict[str, list[tuple[int, int, re.Pattern]]] = {}
+        self.prefix_lengths: list[int] = []
+
+        for position, handler_obj in enumerate(handlers):
+            button_filter = None
+            other_filters = []
+
+            for filter_obj in handler_obj.filters or []:
+                if button_filter is None and isinstance(filter_obj.filter, _ButtonFilter):
+                    button_filter = filter_obj.filter
+                else:
+                    other_filters.append(filter_obj)
+
+            if button_filter is None:
+                self.plain.append((position, handler_obj, handler_obj.filters, None))
+                continue
+
+            self.cast_update = button_filter.cast_update
+            self.buttons[position] = (handler_obj, other_filters)
+
+            for text, order in button_filter.literals.items():
+                self.exact.setdefault(text, []).append((position, order))
+
+            for tag, (order, schema) in button_filter.schemas.items():
+                self.tags.setdefault(tag, []).append((position, order, schema))
+
+            for order, pattern in button_filter.patterns:
+                self._add_pattern(position, order, pattern)
+
+        self.prefix_lengths.sort()
+
+    def _add_pattern(self, position: int, order: int, pattern: re.Pattern):
+        prefix = literal_prefix(pattern.pattern)
+
+        if prefix not in self.templates:
+            self.templates[prefix] = []
+            self.prefix_lengths.append(len(prefix))
+        self.templates[prefix].append((position, order, pattern))
+
+    def match(self, text: Any) -> dict[int, tuple[int, dict]]:
+        """Return {position: (order, button data)} for handlers with button matching text."""
+        matched = {}
+        if not isinstance(text, str):
+            return matched
+
+        for position, order in self.exact.get(text, ()):
+            if position not in matched or order < matched[position][0]:
+                matched[position] = (order, {})
+
+        text_length = len(text)
+        for length in self.prefix_lengths:
+            if length > text_length:
+                break
+
+            for position, order, pattern in self.templates.get(text[:length], ()):
+                if position in matched and matched[position][0] < order:
+                    continue
+
+                match = pattern.fullmatch(text)
+                if match:
+                    matched[position] = (order, match.groupdict())
+
+        # schema buttons are preferred, as in _ButtonFilter.match
+        for position, order, schema in self.tags.get(CallbackSchema.get_tag(text), ()):
+            values = schema.unpack(text)
+            if values is not None:
+                matched[position] = (order, values)
+
+        return matched
+
+    def get_candidates(self, obj) -> list[Candidate]:
+        """Return handlers which can process obj in order of registration."""
+        if self.cast_update is None:
+            return self.plain
+
+        matched = self.match(self.cast_update(obj))
+        if not matched:
+            return self.plain
+
+        candidates = self.plain.copy()
+        for position, (_, button) in matched.items():
+            handler_obj, filters = self.buttons[position]
+            candidates.append((position, handler_obj, filters, button))
+
+        candidates.sort(key=itemgetter(0))
+        return candidates
+
+
+class ButtonsHandler(Handler):
+    """Handler which selects handlers with button filter by ButtonsIndex.
+
+    Lookup cost doesn't depend on count of buttons. Button filters are not called,
+    matched data is passed to handler as `button` kwarg (same as _ButtonFilter does).
+    """
+
+    metrics = None  # set by Metrics.install
+
+    def __init__(self, dispatcher, once=True, middleware_key=None):
+        super().__init__(dispatcher, once, middleware_key)
+        self._index: Optional[ButtonsIndex] = None
+
+    def get_candidates(self, obj) -> list[Candidate]:
+        if self.metrics is None:
+            return self.index.get_candidates(obj)
+
+        started = time.perf_counter()
+        candidates = self.index.get_candidates(obj)
+        self.metrics.observe('filter', f'{self.middleware_key}_buttons_index', time.perf_counter() - started)
+        return candidates
+
+    @property
+    def index(self) -> ButtonsIndex:
+        if self._index is None:
+            self._index = ButtonsIndex(self.handlers)
+        return self._index
+
+    def register(self, handler, filters=None, index=None):
+        super().register(handler, filters, index)
+        self._index = None
+
+    def unregister(self, handler):
+        self._index = None
+        return super().unregister(handler)
+
+    async def notify(self, *args):
+        results = []
+
+        data = {}
+        ctx_data.set(data)
+
+        if self.middleware_key:
+            try:
+                await self.dispatcher.middleware.trigger(f"pre_process_{self.middleware_key}", args + (data,))
+            except CancelHandler:  # Allow to cancel current event
+                return results
+
+        try:
+            for _, handler_obj, filters, button in self.get_candidates(args[0]):
+                try:
+                    filters_data = await check_filters(filters, args)
+                except FilterNotPassed:
+                    continue
+
+                if button is not None:
+                    filters_data['button'] = button
+                data.update(filters_data)
+
+                ctx_token = current_handler.set(handler_obj.handler)
+                try:
+                    if self.middleware_key:
+                        await self.dispatcher.middleware.trigger(f"process_{self.middleware_key}", args + (data,))
+                    partial_data = _check_spec(handler_obj.spec, data)
+                    response = await handler_obj.handler(*args, **partial_data)
+                    if response is not None:
+                        results.append(response)
+                    if self.once:
+                        break
+                except SkipHandler:
+                    continue
+                except CancelHandler:
+                    break
+                finally:
+                    current_handler.reset(ctx_token)
+        finally:
+            if self.middleware_key:
+                await self.dispatcher.middleware.trigger(f"post_process_{self.middleware_key}",
+                                                         args + (results, data,))
+
+        return results
@@ -1,15 +1,70 @@
 from __future__ import annotations
 
+import json
+from collections import OrderedDict
+from typing import Optional
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.helper import Item, Helper
 
+CacheKey = tuple[type, tuple[tuple[str, str], ...], int]
+
+
+def _copy_python(obj):
+    """Copy dicts and lists of obj (it's cheaper than deepcopy)."""
+    if isinstance(obj, dict):
+        return {key: _copy_python(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_copy_python(item) for item in obj]
+    return obj
+
+
+class SerializedMarkup(str):
+    """JSON of reply markup. Passed as reply_markup, it is sent as is (aiogram doesn't encode strings)."""
+
+
+class KeyboardCache:
+    """LRU cache of keyboard instances (at most `maxsize` ones)."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._keyboards: OrderedDict[CacheKey, InlineKeyboard] = OrderedDict()
+
+    def __len__(self):
+        return len(self._keyboards)
+
+    def get(self, key: CacheKey) -> Optional[InlineKeyboard]:
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._keyboards.move_to_end(key)
+        return keyboard
+
+    def put(self, key: CacheKey, keyboard: InlineKeyboard):
+        self._keyboards[key] = keyboard
+        self._keyboards.move_to_end(key)
+        while len(self._keyboards) > self.maxsize:
+            self._keyboards.popitem(last=False)
+
+    def clear(self):
+        self._keyboards.clear()
+
 
 class InlineKeyboard(InlineKeyboardMarkup, Helper):
     DATA_ROWS: list[Item, tuple[Item]] = []
 
+    cache = KeyboardCache()
+
     def __init__(self, cdata_and_text: dict[str, str] = None, row_width=2):
         """Buttons in format: {callback_data:text} for DATA_ROWS."""
         super().__init__(row_width)
+        self._frozen = False
+        self._python: Optional[dict] = None
+        self._serialized: Optional[SerializedMarkup] = None
 
         if cdata_and_text:
             buttons = {cdata.upper(): text for cdata, text in cdata_and_text.items() if text}
@@ -20,9 +75,77 @@ class InlineKeyboard(InlineKeyboardMarkup, Helper):
             btn_row = self.make_buttons_row(data_row, buttons)
             self.row(*btn_row)
 
+    @classmethod
+    def cached(cls, cdata_and_text: dict[str, str] = None, row_width=2) -> InlineKeyboard:
+        """Return shared (frozen) keyboard for passed args, create it on first call.
+
+        Markup of cached keyboard is serialized once. It can't be changed, use copy() for it.
+        """
+        key = (cls, tuple(sorted((cdata_and_text or {}).items())), row_width)
+        keyboard = cls.cache.get(key)
+        if keyboard is None:
+            keyboard = cls(cdata_and_text, row_width)
+            keyboard.freeze()
+            cls.cache.put(key, keyboard)
+        return keyboard
+
+    def freeze(self):
+        """Forbid changes of keyboard, so its markup can be serialized once."""
+        self._frozen = True
+
+    def copy(self) -> InlineKeyboard:
+        keyboard = type(self).__new__(type(self))
+        InlineKeyboardMarkup.__init__(keyboard, self.row_width, [row.copy() for row in self.inline_keyboard])
+        keyboard._frozen = False
+        keyboard._python = keyboard._serialized = None
+        return keyboard
+
+    def _check_frozen(self):
+        if self._frozen:
+            raise RuntimeError('Cached keyboard is shared and can\'t be changed, use copy()')
+
+    def add(self, *args):
+        self._check_frozen()
+        return super().add(*args)
+
+    def row(self, *args):
+        self._check_frozen()
+        return super().row(*args)
+
+    def insert(self, button):
+        self._check_frozen()
+        return super().insert(button)
+
+    def to_python(self) -> dict:
+        """Return markup dict (built once for frozen keyboard, callers get its copy)."""
+        if not self._frozen:
+            return super().to_python()
+        if self._python is None:
+            self._python = super().to_python()
+        return _copy_python(self._python)
+
+    @property
+    def serialized(self) -> SerializedMarkup:
+        """JSON of markup (computed once for frozen keyboard).
+
+        aiogram encodes keyboards passed as reply_markup on every send, pass this instead to skip it.
+        """
+        if not self._frozen:
+            return SerializedMarkup(json.dumps(self.to_python()))
+        if self._serialized is None:
+            if self._python is None:
+                self._python = super().to_python()
+            self._serialized = SerializedMarkup(json.dumps(self._python))
+        return self._serialized
+
     @property
     def data_rows(self) -> list[list[str]]:
-        return [self._to_values_list(row) for row in self.DATA_ROWS]
+        cls = type(self)
+        data_rows = cls.__dict__.get('_data_rows')
+        if data_rows is None:
+            data_rows = [self._to_values_list(row) for row in self.DATA_ROWS]
+            setattr(cls, '_data_rows', data_rows)
+        return data_rows
 
     def make_buttons_row(self, data_row: list[str], buttons: dict) -> list[InlineKeyboardButton]:
         return [self._make_data_button(cdata, buttons) for cdata in data_row if cdata in buttons]
@@ -0,0 +1,316 @@
+"""Contain optional latency metrics of Dispatcher parts exported in Prometheus text format."""
+from __future__ import annotations
+
+import bisect
+import functools
+import inspect
+import time
+from typing import Optional, Callable, Any
+
+from aiogram.dispatcher.filters import FilterNotPassed
+from aiogram.dispatcher.handler import Handler, SkipHandler, CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware, LifetimeControllerMiddleware, MiddlewareManager
+from aiogram.utils.exceptions import Throttled
+from aiohttp import web
+
+from aiogram_tools._engine import get_chat_key
+from aiogram_tools._handler import ButtonsHandler
+from aiogram_tools.filters import _ButtonFilter
+
+__all__ = ['Metrics', 'Histogram']
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STORAGE_METHODS = (
+    'get_state', 'get_data', 'set_state', 'set_data', 'update_data', 'reset_state', 'reset_data',
+    'finish', 'apply_operations', 'get_bucket', 'set_bucket', 'update_bucket',
+)
+# exceptions which control flow of dispatcher, they aren't errors
+CONTROL_FLOW = (SkipHandler, CancelHandler, FilterNotPassed, Throttled)
+
+PREFIX = 'aiogram_tools'
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[int]:
+        result, total = [], 0
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _get_name(obj) -> str:
+    if inspect.isfunction(obj) or inspect.ismethod(obj):
+        return obj.__qualname__
+    return type(obj).__name__
+
+
+class Metrics:
+    """Latency histograms and error counters of handlers, filters, middlewares, Bot API methods and storage.
+
+    Nothing is measured until install(dispatcher): it wraps parts of dispatcher, so without metrics
+    there is no overhead at all. Handlers and middlewares added after install are measured too.
+    render() returns metrics in Prometheus text format, serve() exposes them at http://host:port/metrics.
+    """
+
+    def __init__(self):
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+        self.errors: dict[tuple[str, str], int] = {}
+        self.in_flight: dict[int, int] = {}  # chat (or user) id -> updates being processed
+        self.dispatcher = None
+        self._runner: Optional[web.AppRunner] = None
+
+    def observe(self, kind: str, name: str, seconds: float):
+        histogram = self.histograms.get((kind, name))
+        if histogram is None:
+            histogram = self.histograms[kind, name] = Histogram()
+        histogram.observe(seconds)
+
+    def count_error(self, kind: str, name: str):
+        self.errors[kind, name] = self.errors.get((kind, name), 0) + 1
+
+    def timed(self, kind: str, name: str, func: Callable) -> Callable:
+        """Return async wrapper of func (sync or async) which observes its latency."""
+        observe, count_error = self.observe, self.count_error
+
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            except CONTROL_FLOW:
+                raise
+            except Exception:
+                count_error(kind, name)
+                raise
+            finally:
+                observe(kind, name, time.perf_counter() - started)
+
+        if inspect.isfunction(func) or inspect.ismethod(func):
+            functools.update_wrapper(wrapper, func)  # keeps attributes of handler (e.g. rate limit)
+        wrapper._metrics_original = func
+        return wrapper
+
+    # --- install ---
+
+    def install(self, dispatcher):
+        self.dispatcher = dispatcher
+
+        for handlers in vars(dispatcher).values():
+            if isinstance(handlers, Handler):
+                self._install_handlers(handlers)
+
+        self._wrap_middlewares(dispatcher.middleware)
+        self._wrap_storage(dispatcher.storage)
+        self._wrap_bot(dispatcher.bot)
+
+    def _install_handlers(self, handlers: Handler):
+        if handlers is self.dispatcher.updates_handler:
+            wrap = self._wrap_update_handler
+        else:
+            wrap = self._wrap_handler
+        if isinstance(handlers, ButtonsHandler):
+            handlers.metrics = self  # it measures lookup of buttons
+
+        for handler_obj in handlers.handlers:
+            wrap(handler_obj)
+
+        register, unregister = handlers.register, handlers.unregister
+
+        @functools.wraps(register)
+        def register_with_metrics(handler, filters=None, index=None):
+            register(handler, filters, index)
+            for handler_obj in handlers.handlers:
+                if handler_obj.handler is handler:
+                    wrap(handler_obj)
+
+        @functools.wraps(unregister)
+        def unregister_with_metrics(handler):
+            for handler_obj in handlers.handlers:
+                if getattr(handler_obj.handler, '_metrics_original', None) is handler:
+                    handler_obj.handler = handler
+            return unregister(handler)
+
+        handlers.register, handlers.unregister = register_with_metrics, unregister_with_metrics
+
+    def _wrap_handler(self, handler_obj: Handler.HandlerObj):
+        if hasattr(handler_obj.handler, '_metrics_original'):
+            return
+        handler_obj.handler = self.timed('handler', _get_name(handler_obj.handler), handler_obj.handler)
+
+        for filter_obj in handler_obj.filters or []:
+            # button filters are not called by ButtonsHandler, ButtonsIndex finds them by isinstance
+            if isinstance(filter_obj.filter, _ButtonFilter) or hasattr(filter_obj.filter, '_metrics_original'):
+                continue
+            filter_obj.filter = self.timed('filter', _get_name(filter_obj.filter), filter_obj.filter)
+            filter_obj.is_async = True
+
+    def _wrap_update_handler(self, handler_obj: Handler.HandlerObj):
+        """Measure whole processing of update and count updates in flight per chat."""
+        process_update = handler_obj.handler
+        if hasattr(process_update, '_metrics_original'):
+            return
+
+        timed = self.timed('update', _get_name(process_update), process_update)
+        in_flight = self.in_flight
+        dispatcher = self.dispatcher
+
+        @functools.wraps(process_update)
+        async def wrapper(update):
+            chat = get_chat_key(dispatcher, update)
+            in_flight[chat] = in_flight.get(chat, 0) + 1
+            try:
+                return await timed(update)
+            finally:
+                in_flight[chat] -= 1
+                if not in_flight[chat]:
+                    del in_flight[chat]
+
+        wrapper._metrics_original = process_update
+        handler_obj.handler = wrapper
+
+    def _wrap_middlewares(self, manager: MiddlewareManager):
+        """Replace trigger of manager by one which measures each middleware hook."""
+        if hasattr(manager.trigger, '_metrics_original'):
+            return
+
+        hooks: dict[tuple[type, str], Optional[str]] = {}  # (middleware type, action) -> name of hook or None
+
+        def get_hook(middleware: BaseMiddleware, action: str) -> Optional[str]:
+            key = (type(middleware), action)
+            if key not in hooks:
+                handles = (isinstance(middleware, LifetimeControllerMiddleware)
+                           or getattr(middleware, f'on_{action}', None) is not None)
+                hooks[key] = f'{type(middleware).__name__}.{action}' if handles else None
+            return hooks[key]
+
+        async def trigger_with_metrics(action, args):
+            for middleware in manager.applications:
+                hook = get_hook(middleware, action)
+                if hook is None:
+                    await middleware.trigger(action, args)
+                    continue
+
+                started = time.perf_counter()
+                try:
+                    await middleware.trigger(action, args)
+                except CONTROL_FLOW:
+                    raise
+                except Exception:
+                    self.count_error('middleware', hook)
+                    raise
+                finally:
+                    self.observe('middleware', hook, time.perf_counter() - started)
+
+        trigger_with_metrics._metrics_original = manager.trigger
+        manager.trigger = trigger_with_metrics
+
+    def _wrap_storage(self, storage):
+        for method in STORAGE_METHODS:
+            func = getattr(storage, method, None)
+            if func is not None and not hasattr(func, '_metrics_original'):
+                setattr(storage, method, self.timed('storage', method, func))
+
+    def _wrap_bot(self, bot):
+        request = bot.request
+        if hasattr(request, '_metrics_original'):
+            return
+
+        async def request_with_metrics(method, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await request(method, *args, **kwargs)
+            except Exception:
+                self.count_error('bot_method', method)
+                raise
+            finally:
+                self.observe('bot_method', method, time.perf_counter() - started)
+
+        request_with_metrics._metrics_original = request
+        bot.request = request_with_metrics
+
+    # --- export ---
+
+    def get_gauges(self) -> dict[str, float]:
+        """Return live values of engine and send scheduler (names ending with _total are counters)."""
+        gauges = {}
+        dispatcher = self.dispatcher
+
+        engine = getattr(dispatcher, 'engine', None)
+        if engine is not None:
+            gauges['engine_queue_depth'] = engine.queue_depth
+            gauges['engine_processed_total'] = engine.stats.processed
+            gauges['engine_failed_total'] = engine.stats.failed
+            gauges['engine_duplicates_total'] = engine.stats.duplicates
+
+        send_scheduler = getattr(dispatcher and dispatcher.bot, 'send_scheduler', None)
+        if send_scheduler is not None:
+            gauges['sender_queue_depth'] = send_scheduler.queue_depth
+            gauges['sender_in_flight'] = send_scheduler.in_flight
+
+        gauges['updates_in_flight'] = sum(self.in_flight.values())
+        return gauges
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {PREFIX}_latency_seconds Latency of parts of update processing.',
+            f'# TYPE {PREFIX}_latency_seconds histogram',
+        ]
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            labels = f'kind="{_escape(kind)}",name="{_escape(name)}"'
+            for bound, count in zip((*BUCKETS, '+Inf'), histogram.cumulative()):
+                lines.append(f'{PREFIX}_latency_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{PREFIX}_latency_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'{PREFIX}_latency_seconds_count{{{labels}}} {histogram.count}')
+
+        lines.append(f'# HELP {PREFIX}_errors_total Exceptions raised by parts of update processing.')
+        lines.append(f'# TYPE {PREFIX}_errors_total counter')
+        for (kind, name), count in sorted(self.errors.items()):
+            lines.append(f'{PREFIX}_errors_total{{kind="{_escape(kind)}",name="{_escape(name)}"}} {count}')
+
+        for name, value in self.get_gauges().items():
+            metric_type = 'counter' if name.endswith('_total') else 'gauge'
+            lines.append(f'# TYPE {PREFIX}_{name} {metric_type}')
+            lines.append(f'{PREFIX}_{name} {value}')
+
+        lines.append(f'# HELP {PREFIX}_chat_updates_in_flight Updates being processed per chat (or user).')
+        lines.append(f'# TYPE {PREFIX}_chat_updates_in_flight gauge')
+        for chat, count in list(self.in_flight.items()):
+            lines.append(f'{PREFIX}_chat_updates_in_flight{{chat="{_escape(chat)}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+    async def handle(self, _: web.Request) -> web.Response:
+        return web.Response(body=self.render().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 9100):
+        """Start HTTP server with metrics at /metrics."""
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,8 +1,14 @@
 """Contain all data models."""
 from __future__ import annotations
 
-from dataclasses import dataclass, field, fields, asdict, Field
-from typing import Union, TypeVar
+import copy
+import dataclasses
+import inspect
+import itertools
+import sys
+import typing
+from dataclasses import dataclass, field, fields, Field
+from typing import Union, TypeVar, Callable, Optional, Any
 
 from bson import ObjectId
 
@@ -12,17 +18,191 @@ T = TypeVar('T')
 EmptyList = field(default_factory=list)
 EmptyDict = field(default_factory=dict)
 
+# values of these types are not copied by to_dict
+SCALAR_TYPES = (str, int, float, bool, bytes, type(None), ObjectId)
+SCALAR_CLASSES = frozenset(SCALAR_TYPES)
+
+
+def encode_value(value: Any) -> Any:
+    """Convert DataModels in value to dicts and copy other values (as dataclasses.asdict does).
+
+    Scalars are not copied, containers are copied without deepcopy, other objects are deep copied.
+    """
+    if isinstance(value, SCALAR_TYPES):
+        return value
+    if isinstance(value, DataModel):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {encode_value(key): encode_value(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return type(value)(*map(encode_value, value)) if hasattr(value, '_fields') else tuple(map(encode_value, value))
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return copy.deepcopy(value)
+
+
+def make_decoder(field_type: Any) -> Optional[Callable[[Any], Any]]:
+    """Return function which converts stored value to field_type, None if value is stored as is.
+
+    Supported: DataModel, Optional[DataModel], list[DataModel], dict[key, DataModel].
+    """
+    if inspect.isclass(field_type) and issubclass(field_type, DataModel):
+        return field_type.from_dict
+
+    origin, args = typing.get_origin(field_type), typing.get_args(field_type)
+
+    if origin is Union:
+        decoders = [make_decoder(arg) for arg in args if arg is not type(None)]
+        if len(decoders) == 1 and decoders[0] is not None:
+            decoder = decoders[0]
+            return lambda value: None if value is None else decoder(value)
+
+    elif origin is list and args:
+        decoder = make_decoder(args[0])
+        if decoder is not None:
+            return lambda value: [decoder(item) for item in value]
+
+    elif origin is dict and len(args) == 2:
+        decoder = make_decoder(args[1])
+        if decoder is not None:
+            return lambda value: {key: decoder(item) for key, item in value.items()}
+
+
+def resolve_field_types(cls: type) -> dict[str, Any]:
+    """Return types of fields of dataclass, None for annotation which can't be resolved (e.g. forward reference).
+
+    Annotations are resolved one by one if some of them can't be, so others are still resolved.
+    """
+    try:
+        hints = typing.get_type_hints(cls)
+    except Exception:
+        hints = None
+
+    field_types = {}
+    for f in fields(cls):
+        if hints is not None:
+            field_types[f.name] = hints.get(f.name)
+        else:
+            field_types[f.name] = _resolve_annotation(cls, f.name, f.type)
+    return field_types
+
+
+def _resolve_annotation(cls: type, name: str, annotation: Any) -> Any:
+    if not isinstance(annotation, str):
+        return annotation
+
+    owner = next((base for base in cls.__mro__ if name in vars(base).get('__annotations__', {})), cls)
+    global_ns = vars(sys.modules[owner.__module__]) if owner.__module__ in sys.modules else {}
+    local_ns = {**vars(owner), owner.__name__: owner}
+    try:
+        return eval(annotation, global_ns, local_ns)
+    except Exception:
+        return None
+
+
+def is_scalar_type(field_type: Any) -> bool:
+    """Check if values of field_type are never copied or converted by to_dict."""
+    if typing.get_origin(field_type) is Union:
+        return all(is_scalar_type(arg) for arg in typing.get_args(field_type))
+    return inspect.isclass(field_type) and issubclass(field_type, SCALAR_TYPES)
+
+
+class ModelCodec:
+    """Convert instances of dataclass to dicts and back with functions generated once for the class."""
+
+    def __init__(self, cls: type[DataModel]):
+        self.cls = cls
+        self.fields: tuple[Field, ...] = fields(cls)
+        self.field_names: tuple[str, ...] = tuple(f.name for f in self.fields)
+        self.field_set: frozenset[str] = frozenset(self.field_names)
+
+        field_types = resolve_field_types(cls)
+
+        self.decoders: dict[str, Callable] = {}
+        for name, field_type in field_types.items():
+            decoder = make_decoder(field_type)
+            if decoder is not None:
+                self.decoders[name] = decoder
+
+        self.encode: Callable[[DataModel], dict] = self._make_encoder(field_types)
+        self.decode: Callable[[dict], DataModel] = self._make_decoder()
+
+    def _make_encoder(self, field_types: dict[str, Any]) -> Callable[[DataModel], dict]:
+        items = []
+        for name in self.field_names:
+            if is_scalar_type(field_types[name]):
+                # annotation isn't checked: value of other type is copied
+                items.append(f'{name!r}: obj.{name} if obj.{name}.__class__ in scalar_classes '
+                             f'else encode_value(obj.{name})')
+            else:
+                items.append(f'{name!r}: encode_value(obj.{name})')
+
+        source = f'def encode(obj):\n    return {{{", ".join(items)}}}\n'
+        return self._compile(source, 'encode', {'encode_value': encode_value, 'scalar_classes': SCALAR_CLASSES})
+
+    def _make_decoder(self) -> Callable[[dict], DataModel]:
+        lines = ['def decode(data):', '    kwargs = {}']
+        namespace = {'cls': self.cls}
+
+        for i, name in enumerate(self.field_names):
+            lines.append(f'    if {name!r} in data:')
+            if name in self.decoders:
+                namespace[f'decoder_{i}'] = self.decoders[name]
+                lines.append(f'        kwargs[{name!r}] = decoder_{i}(data[{name!r}])')
+            else:
+                lines.append(f'        kwargs[{name!r}] = data[{name!r}]')
+
+        lines.append('    return cls(**kwargs)')
+        return self._compile('\n'.join(lines) + '\n', 'decode', namespace)
+
+    def _compile(self, source: str, name: str, namespace: dict) -> Callable:
+        exec(compile(source, f'<{self.cls.__qualname__} codec>', 'exec'), namespace)
+        return namespace[name]
+
+
+def with_slots(cls: type[T]) -> type[T]:
+    """Recreate dataclass with __slots__ of its fields (less memory per instance). Use above @dataclass:
+
+        @with_slots
+        @dataclass
+        class User(DataModel):
+            ...
+    """
+    inherited = set(itertools.chain.from_iterable(getattr(base, '__slots__', ()) for base in cls.__mro__[1:]))
+    field_names = [f.name for f in fields(cls)]
+
+    namespace = dict(cls.__dict__)
+    for name in (*field_names, '__dict__', '__weakref__', '_codec'):
+        namespace.pop(name, None)
+    namespace['__slots__'] = tuple(name for name in field_names if name not in inherited)
+
+    new_cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
+
 
 @dataclass
 class DataModel:
+    __slots__ = ()
 
     def to_dict(self):
-        return asdict(self)
+        return type(self).get_codec().encode(self)
+
+    @classmethod
+    def get_codec(cls) -> ModelCodec:
+        """Return codec of class (it is created on first call)."""
+        codec = cls.__dict__.get('_codec')
+        if codec is None:
+            codec = ModelCodec(cls)
+            setattr(cls, '_codec', codec)
+        return codec
 
     @classmethod
     @property
     def field_names(cls) -> list[str]:
-        return [f.name for f in fields(cls)]
+        return list(cls.get_codec().field_names)
 
     @classmethod
     @property
@@ -31,32 +211,20 @@ class DataModel:
 
     @classmethod
     def _resolve_fields(cls, obj_data: dict) -> dict:
-        resolved_data = {}
-        for key, value in obj_data.items():
-            if key in cls.field_names:
-                resolved_data[key] = value
-        return resolved_data
+        field_set = cls.get_codec().field_set
+        return {key: value for key, value in obj_data.items() if key in field_set}
 
     @classmethod
     def from_dict(cls: type[T], obj_data: dict) -> T:
         if not obj_data:
             return None
 
-        resolved_data = cls._resolve_fields(obj_data)
-
-        for _field, value in resolved_data.items():
-            field_type = cls.__annotations__.get(_field)
-            factory = getattr(field_type, 'from_dict', None)
-            if factory:
-                resolved_data[_field] = factory(value)
-
-        # noinspection PyArgumentList
-        return cls(**resolved_data)
+        return cls.get_codec().decode(obj_data)
 
 
 class MongoModelMeta(type):
     def __new__(mcs, name, bases, namespace):
-        if '_id' not in namespace:
+        if '_id' not in namespace and '_id' not in namespace.get('__slots__', ()):
             namespace['_id'] = field(default=None)
             namespace.setdefault('__annotations__', {})['_id'] = None
 
@@ -65,6 +233,7 @@ class MongoModelMeta(type):
 
 
 class MongoModel(DataModel, metaclass=MongoModelMeta):
+    __slots__ = ()
     _id: Union[str, int, ObjectId] = None
 
     @property
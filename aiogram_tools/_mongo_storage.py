@@ -0,0 +1,44 @@
+"""Contain MongoStorage which changes FSM data by atomic updates (requires motor)."""
+from __future__ import annotations
+
+from typing import Union, Optional, Any
+
+from aiogram.contrib.fsm_storage.mongo import MongoStorage as _MongoStorage, DATA
+
+from aiogram_tools._operations import Operation, apply_to_dict, to_mongo_updates
+
+__all__ = ['MongoStorage']
+
+
+class MongoStorage(_MongoStorage):
+    """MongoStorage which updates data by $set/$push/$unset instead of read-modify-write.
+
+    Operations are applied by read-modify-write (as aiogram's MongoStorage does) if some of them
+    is pull ($pull removes all occurrences of item, not one) or has key which Mongo can't address
+    as field of data (with '.' or starting with '$'), so such keys are stored flat.
+    """
+
+    @staticmethod
+    def is_field_key(key: Any) -> bool:
+        """Check if 'data.<key>' addresses key itself (not nested field or operator)."""
+        return isinstance(key, str) and bool(key) and '.' not in key and not key.startswith('$')
+
+    async def apply_operations(self, *, chat: Union[str, int, None] = None, user: Union[str, int, None] = None,
+                               operations: list[Operation]):
+        if not all(operation.op != 'pull' and self.is_field_key(operation.key) for operation in operations):
+            data = await self.get_data(chat=chat, user=user, default={})
+            apply_to_dict(data, operations)
+            await self.set_data(chat=chat, user=user, data=data)
+            return
+
+        chat, user = self.check_address(chat=chat, user=user)
+        db = await self.get_db()
+
+        for update in to_mongo_updates(operations, prefix='data.'):
+            await db[DATA].update_one(filter={'chat': chat, 'user': user}, update=update, upsert=True)
+
+    async def update_data(self, *, chat: Union[str, int, None] = None, user: Union[str, int, None] = None,
+                          data: Optional[dict] = None, **kwargs):
+        data = {**(data or {}), **kwargs}
+        operations = [Operation('set', key, value) for key, value in data.items()]
+        await self.apply_operations(chat=chat, user=user, operations=operations)
@@ -0,0 +1,133 @@
+"""Contain atomic operations on FSM data and their fallback for storages without native support."""
+from __future__ import annotations
+
+from typing import NamedTuple, Literal, Any, Optional
+
+from aiogram.dispatcher import FSMContext
+
+from aiogram_tools._fsm import UpdateFSMContext
+
+__all__ = ['Operation', 'apply_to_dict', 'merge_operations', 'to_mongo_updates', 'apply_operations']
+
+
+class Operation(NamedTuple):
+    """Operation on key of FSM data.
+
+    set - set value; push - append items of value (list) to list (missing key is empty list);
+    pull - remove one occurrence of each item of value (list) from list; unset - delete key.
+    push and pull raise TypeError if value of key isn't list.
+    """
+    op: Literal['set', 'push', 'pull', 'unset']
+    key: str
+    value: Any = None
+
+
+def _get_list(data: dict, key: str) -> list:
+    value = data.get(key, [])
+    if not isinstance(value, list):
+        raise TypeError(f'Value of {key!r} is {type(value).__name__}, not list')
+    return value
+
+
+def apply_to_dict(data: dict, operations: list[Operation]) -> set[str]:
+    """Apply operations to data in place, return keys which are changed (not deleted)."""
+    changed = set()
+
+    for op, key, value in operations:
+        if op == 'set':
+            data[key] = value
+        elif op == 'push':
+            data[key] = [*_get_list(data, key), *value]
+        elif op == 'pull':
+            if key not in data:
+                continue
+            items = list(_get_list(data, key))
+            for item in value:
+                if item in items:
+                    items.remove(item)
+            data[key] = items
+        elif op == 'unset':
+            data.pop(key, None)
+            changed.discard(key)
+            continue
+        else:
+            raise ValueError(f'Unknown operation: {op}')
+        changed.add(key)
+
+    return changed
+
+
+def merge_operations(first: Operation, second: Operation) -> Optional[Operation]:
+    """Return one operation with effect of first and then second on same key, None if there is no such."""
+    op, key, value = second
+    if op in ('set', 'unset'):
+        return second
+    if op != 'push':
+        return None
+    if first.op == 'unset':
+        return Operation('set', key, list(value))
+    if first.op == 'set' and isinstance(first.value, list):
+        return Operation('set', key, [*first.value, *value])
+    if first.op == 'push':
+        return Operation('push', key, [*first.value, *value])
+    return None
+
+
+def to_mongo_updates(operations: list[Operation], prefix: str = '') -> list[dict]:
+    """Convert set, push and unset operations to Mongo update documents ($set/$push/$unset).
+
+    pull isn't supported: $pull removes all occurrences of item, not one.
+    Operations on one key are merged (see merge_operations). Those which can't be merged
+    (push after set of not list value) go to next update documents, so usually there is one document.
+    """
+    chains: dict[str, list[Operation]] = {}  # key -> operations which can't be merged
+    for operation in operations:
+        chain = chains.setdefault(operation.key, [])
+        merged = merge_operations(chain[-1], operation) if chain else None
+        if merged is not None:
+            chain[-1] = merged
+        else:
+            chain.append(operation)
+
+    updates = []
+    operators = {'set': '$set', 'push': '$push', 'unset': '$unset'}
+
+    for chain in chains.values():
+        for i, (op, key, value) in enumerate(chain):
+            if i == len(updates):
+                updates.append({})
+
+            if op == 'set':
+                field_value = value
+            elif op == 'push':
+                field_value = {'$each': list(value)}
+            elif op == 'unset':
+                field_value = ''
+            else:
+                raise ValueError(f'Operation {op} can\'t be converted to Mongo update')
+            updates[i].setdefault(operators[op], {})[f'{prefix}{key}'] = field_value
+
+    return updates
+
+
+async def apply_operations(state_ctx: FSMContext, operations: list[Operation]):
+    """Apply operations to data of FSM context.
+
+    Natively (and atomically), if storage has `apply_operations(chat, user, operations)` method,
+    else - read data, apply operations and write changed keys only (whole data if some keys are deleted).
+    """
+    if not operations:
+        return
+
+    native = getattr(state_ctx.storage, 'apply_operations', None)
+    if native is not None and not isinstance(state_ctx, UpdateFSMContext):
+        await native(chat=state_ctx.chat, user=state_ctx.user, operations=operations)
+        return
+
+    data = await state_ctx.get_data()
+    changed = apply_to_dict(data, operations)
+
+    if any(operation.op == 'unset' for operation in operations):
+        await state_ctx.set_data(data)
+    else:
+        await state_ctx.update_data({key: data[key] for key in changed})
@@ -0,0 +1,140 @@
+"""Contain long polling which overlaps getUpdates with processing of updates."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiohttp.helpers import sentinel
+
+__all__ = ['PipelinedPolling', 'PollingStats']
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PollingStats:
+    requests: int = 0
+    updates: int = 0
+    empty: int = 0
+    errors: int = 0
+    fetch_time: float = 0.0
+    handoff_time: float = 0.0
+
+    @property
+    def avg_batch(self) -> float:
+        if not self.requests:
+            return 0.0
+        return self.updates / self.requests
+
+
+class PipelinedPolling:
+    """Long polling which feeds Dispatcher.engine.
+
+    Received batch is handed off to queues of engine and next getUpdates is sent at once (without relax),
+    so its round trip overlaps processing of batch. Offset of request covers handed off updates only:
+    update is committed to Telegram after it is enqueued.
+
+    Limit doubles while batches are full and halves when they are small, it never exceeds free slots of engine.
+    Timeout is 0 after full batch (more updates are pending) and `timeout` otherwise.
+    """
+
+    def __init__(self, dispatcher, timeout: int = 20, min_limit: int = 10, max_limit: int = 100,
+                 error_sleep: float = 5):
+        self.dispatcher = dispatcher
+        self.max_timeout = timeout
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.error_sleep = error_sleep
+
+        self.limit = min_limit
+        self.timeout = timeout
+        self.offset = None
+        self.stats = PollingStats()
+
+    def adapt(self, received: int):
+        """Change limit and timeout of next request by size of received batch."""
+        if received >= self.limit:
+            self.limit = min(self.max_limit, self.limit * 2)
+            self.timeout = 0
+            return
+
+        if received < self.limit // 4:
+            self.limit = max(self.min_limit, self.limit // 2)
+        self.timeout = self.max_timeout
+
+    def get_limit(self) -> int:
+        engine = self.dispatcher.engine
+        free = engine.queue_size - engine.queue_depth
+        return max(1, min(self.limit, free))
+
+    def _request_timeout(self, bot: Bot):
+        current_request_timeout = bot.timeout
+        if current_request_timeout is sentinel:
+            return None
+        return aiohttp.ClientTimeout(total=current_request_timeout.total + self.timeout or 1)
+
+    async def fetch(self) -> list:
+        bot = self.dispatcher.bot
+        started = time.monotonic()
+
+        with bot.request_timeout(self._request_timeout(bot)):
+            updates = await bot.get_updates(offset=self.offset, limit=self.get_limit(), timeout=self.timeout)
+
+        stats = self.stats
+        stats.requests += 1
+        stats.updates += len(updates)
+        stats.empty += not updates
+        stats.fetch_time += time.monotonic() - started
+        return updates
+
+    async def hand_off(self, updates: list):
+        """Enqueue updates to engine, move offset after each of them."""
+        engine = self.dispatcher.engine
+        started = time.monotonic()
+
+        for update in updates:
+            await engine.put(update)
+            self.offset = update.update_id + 1
+
+        self.stats.handoff_time += time.monotonic() - started
+
+    async def run(self, reset_webhook=None):
+        """Poll until Dispatcher.stop_polling() (works like Dispatcher.start_polling)."""
+        dispatcher = self.dispatcher
+        if dispatcher._polling:
+            raise RuntimeError('Polling already started')
+
+        log.info('Start pipelined polling.')
+        Dispatcher.set_current(dispatcher)
+        Bot.set_current(dispatcher.bot)
+
+        if reset_webhook is None:
+            await dispatcher.reset_webhook(check=False)
+        if reset_webhook:
+            await dispatcher.reset_webhook(check=True)
+
+        dispatcher.engine.start()
+        dispatcher._polling = True
+        try:
+            while dispatcher._polling:
+                try:
+                    updates = await self.fetch()
+                except asyncio.CancelledError:
+                    break
+                except Exception:
+                    self.stats.errors += 1
+                    log.exception('Cause exception while getting updates.')
+                    await asyncio.sleep(self.error_sleep)
+                    continue
+
+                if updates:
+                    log.debug(f'Received {len(updates)} updates.')
+                    await self.hand_off(updates)
+                self.adapt(len(updates))
+        finally:
+            dispatcher._close_waiter.set_result(None)
+            log.warning('Polling is stopped.')
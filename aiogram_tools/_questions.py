@@ -2,11 +2,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Union, Callable, Awaitable, Optional
+from typing import Union, Callable, Awaitable
 
 from aiogram import types
 
-from aiogram_tools._states import State, StatesGroupMeta2, StatesGroup2
+from aiogram_tools._states import State, StatesGroupMeta2, StatesGroup2, Transitions
 
 KeyboardMarkup = Union[
     types.ReplyKeyboardMarkup, types.InlineKeyboardMarkup, types.ForceReply
@@ -60,17 +60,5 @@ class SingleConvStatesGroup(ConvStatesGroup):
     """ConvStatesGroup with single states (no switching)."""
 
     @classmethod
-    async def get_last_state(cls) -> Optional[State]:
-        return await cls.get_current_state()
-
-    @classmethod
-    async def get_first_state(cls) -> Optional[State]:
-        return await cls.get_current_state()
-
-    @classmethod
-    async def get_next_state(cls) -> None:
-        return None
-
-    @classmethod
-    async def get_previous_state(cls) -> None:
-        return None
+    def _make_transitions(cls, states: tuple[State, ...]) -> dict[State, Transitions]:
+        return {state: Transitions(previous=None, next=None, first=state, last=state) for state in states}
@@ -0,0 +1,162 @@
+"""Contain async repository for MongoModels over blocking pymongo collection."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Generic, TypeVar, Optional, Union, Any, Iterable, Callable
+
+from aiogram import types
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne, DeleteOne
+from pymongo.collection import Collection
+
+from aiogram_tools._models import MongoModel
+
+__all__ = ['MongoRepository']
+
+M = TypeVar('M', bound=MongoModel)
+ModelId = Union[str, int, ObjectId]
+WriteOp = Union[InsertOne, ReplaceOne, DeleteOne]
+
+
+class MongoRepository(Generic[M]):
+    """Load and save MongoModels of one collection without blocking event loop.
+
+    - Driver calls run in thread pool of `max_workers` threads (or passed executor).
+    - Queries project only fields of model.
+    - Loaded models are kept in identity map of current Update: repeated get() of same _id is free.
+    - Writes inside `async with repository.batch()` are sent by one bulk_write.
+    """
+
+    def __init__(self, collection: Collection, model: type[M], max_workers: int = 4,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.collection = collection
+        self.model = model
+        self.executor = executor or ThreadPoolExecutor(max_workers, thread_name_prefix=f'{collection.name}_repo')
+
+        self._projection = dict.fromkeys(model.field_names, 1)
+        self._identity_map: ContextVar[Optional[tuple[types.Update, dict]]] = ContextVar(
+            f'{collection.name}_identity_map', default=None)
+        self._batch: ContextVar[Optional[list[WriteOp]]] = ContextVar(f'{collection.name}_batch', default=None)
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def _get_identity_map(self) -> Optional[dict]:
+        """Return loaded models of current Update, None outside of update processing."""
+        update = types.Update.get_current()
+        if update is None:
+            return None
+
+        identity_map = self._identity_map.get()
+        if identity_map is None or identity_map[0] is not update:
+            identity_map = (update, {})
+            self._identity_map.set(identity_map)
+        return identity_map[1]
+
+    def _remember(self, model: M) -> M:
+        identity_map = self._get_identity_map()
+        if identity_map is not None and model is not None:
+            identity_map[model._id] = model
+        return model
+
+    def _load(self, document: Optional[dict], identity_map: Optional[dict]) -> Optional[M]:
+        """Return model of document, model already loaded with same _id is returned instead (with its changes)."""
+        if not document:
+            return None
+
+        if identity_map is not None:
+            model = identity_map.get(document['_id'])
+            if model is None:
+                model = identity_map[document['_id']] = self.model.from_dict(document)
+            return model
+        return self.model.from_dict(document)
+
+    # --- reads ---
+
+    async def get(self, _id: ModelId) -> Optional[M]:
+        identity_map = self._get_identity_map()
+        if identity_map is not None and _id in identity_map:
+            return identity_map[_id]
+
+        document = await self._run(self.collection.find_one, {'_id': _id}, self._projection)
+        return self._load(document, self._get_identity_map())
+
+    async def get_many(self, ids: Iterable[ModelId]) -> dict[ModelId, M]:
+        """Return {_id: model} of found models by one query (models from identity map aren't queried)."""
+        ids = list(ids)
+        identity_map = self._get_identity_map() or {}
+        found = {_id: identity_map[_id] for _id in ids if _id in identity_map}
+        missing = [_id for _id in ids if _id not in found]
+
+        if missing:
+            for model in await self.find({'_id': {'$in': missing}}):
+                found[model._id] = model
+        return found
+
+    async def find(self, filter: Optional[dict] = None, *, sort: Optional[list] = None,
+                   skip: int = 0, limit: int = 0) -> list[M]:
+        def query():
+            cursor = self.collection.find(filter or {}, self._projection, skip=skip, limit=limit, sort=sort)
+            return list(cursor)
+
+        documents = await self._run(query)
+        identity_map = self._get_identity_map()
+        return [self._load(document, identity_map) for document in documents]
+
+    # --- writes ---
+
+    @contextlib.asynccontextmanager
+    async def batch(self):
+        """Collect writes of block and send them by one bulk_write at exit."""
+        if self._batch.get() is not None:  # nested batch joins outer one
+            yield
+            return
+
+        token = self._batch.set([])
+        try:
+            yield
+            operations = self._batch.get()
+        finally:
+            self._batch.reset(token)
+
+        await self.bulk_write(operations)
+
+    async def bulk_write(self, operations: list[WriteOp]):
+        if operations:
+            await self._run(self.collection.bulk_write, operations, ordered=True)
+
+    async def _write(self, operations: list[WriteOp]):
+        batch = self._batch.get()
+        if batch is not None:
+            batch.extend(operations)
+        else:
+            await self.bulk_write(operations)
+
+    async def save(self, *models: M):
+        """Insert (model without _id gets new ObjectId) or replace models."""
+        operations = []
+        for model in models:
+            if model._id is None:
+                model._id = ObjectId()
+                operations.append(InsertOne(model.to_dict()))
+            else:
+                operations.append(ReplaceOne({'_id': model._id}, model.to_dict(), upsert=True))
+            self._remember(model)
+
+        await self._write(operations)
+
+    async def delete(self, *models_or_ids: Union[M, ModelId]):
+        identity_map = self._get_identity_map() or {}
+        operations = []
+
+        for obj in models_or_ids:
+            _id = obj._id if isinstance(obj, MongoModel) else obj
+            identity_map.pop(_id, None)
+            operations.append(DeleteOne({'_id': _id}))
+
+        await self._write(operations)
@@ -0,0 +1,328 @@
+"""Contain scheduler of outbound Bot API requests which keeps them within Telegram limits."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import time
+from collections import deque, OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Optional, Union, Callable, Awaitable, Any
+
+from aiogram import types
+from aiogram.utils.exceptions import RetryAfter
+
+__all__ = ['SendScheduler', 'SenderStats', 'Priority', 'TokenBucket', 'send_priority']
+
+log = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+
+send_priority: ContextVar[Optional[Priority]] = ContextVar('send_priority', default=None)
+
+
+def get_current_priority() -> Priority:
+    """Return priority set by SendScheduler.priority(), INTERACTIVE while processing callback and inline queries."""
+    priority = send_priority.get()
+    if priority is not None:
+        return priority
+
+    if types.CallbackQuery.get_current() is not None or types.InlineQuery.get_current() is not None:
+        return Priority.INTERACTIVE
+    return Priority.NORMAL
+
+
+class TokenBucket:
+    """`rate` tokens per `period` seconds, at most `capacity` tokens at once."""
+
+    __slots__ = ('interval', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, period: float = 1.0, capacity: Optional[float] = None):
+        self.interval = period / rate
+        self.capacity = capacity or 1
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+        self.updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Return seconds until token is available."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) * self.interval)
+
+    def consume(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+
+
+@dataclass
+class SenderStats:
+    sent: int = 0
+    failed: int = 0
+    retry_after: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        """Average time (in seconds) between submitting and sending of request."""
+        if not self.sent:
+            return 0.0
+        return self.total_wait / self.sent
+
+
+class _Request:
+    __slots__ = ('send', 'future', 'priority', 'submitted', 'retries')
+
+    def __init__(self, send: Callable[[], Awaitable], future: asyncio.Future, priority: Priority):
+        self.send = send
+        self.future = future
+        self.priority = priority
+        self.submitted = time.monotonic()
+        self.retries = 0
+
+
+class _ChatQueue:
+    __slots__ = ('requests', 'bucket', 'blocked_until', 'busy')
+
+    def __init__(self, bucket: TokenBucket):
+        self.requests: deque[_Request] = deque()
+        self.bucket = bucket
+        self.blocked_until = 0.0
+        self.busy = False
+
+    def __len__(self):
+        return len(self.requests)
+
+    def head_priority(self) -> Priority:
+        """Return priority of oldest waiting request."""
+        return self.requests[0].priority
+
+    def delay(self, now: float) -> float:
+        return max(self.bucket.delay(now), self.blocked_until - now)
+
+
+class SendScheduler:
+    """Send requests to chats with respect to Telegram limits.
+
+    Each chat has own token bucket (private chats - `chat_rate` per second,
+    groups and channels - `group_rate` per minute), all requests share global bucket.
+    Chats are served by priority of their oldest waiting request (see Priority),
+    requests of one chat are sent one by one in order of submitting (priority doesn't reorder them).
+    RetryAfter pauses chat for requested time and request is retried up to `max_retries` times.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, group_rate: float = 20,
+                 max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.stats = SenderStats()
+
+        self._chats: OrderedDict[ChatId, _ChatQueue] = OrderedDict()
+        self._ready: list[tuple[int, int, ChatId]] = []  # (priority, seq, chat_id)
+        self._waiting: list[tuple[float, int, ChatId]] = []  # (ready at, seq, chat_id)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None  # set when there are no unfinished requests
+        self._unfinished = 0
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for sending."""
+        return sum(len(chat) for chat in self._chats.values())
+
+    def depth_by_priority(self) -> dict[str, int]:
+        depth = dict.fromkeys((priority.name for priority in Priority), 0)
+        for chat in self._chats.values():
+            for request in chat.requests:
+                depth[request.priority.name] += 1
+        return depth
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def priority(priority: Priority):
+        """Set priority of requests sent in block."""
+        token = send_priority.set(priority)
+        try:
+            yield
+        finally:
+            send_priority.reset(token)
+
+    @staticmethod
+    def is_limited(method: str) -> bool:
+        """Check if Bot API method sends (or edits) message, so it is limited."""
+        return method.startswith(('send', 'forward', 'copy', 'edit')) and method != 'sendChatAction'
+
+    def make_bucket(self, chat_id: ChatId) -> TokenBucket:
+        if isinstance(chat_id, int) and chat_id > 0:
+            return TokenBucket(self.chat_rate)
+        return TokenBucket(self.group_rate, period=60)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            if not self._unfinished:
+                self._idle.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Wait for waiting requests and stop scheduler."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def submit(self, chat_id: ChatId, send: Callable[[], Awaitable],
+                     priority: Optional[Priority] = None) -> Any:
+        """Enqueue request to chat and wait for its result."""
+        self.start()
+
+        if priority is None:
+            priority = get_current_priority()
+        request = _Request(send, asyncio.get_running_loop().create_future(), priority)
+
+        self._evict(time.monotonic())
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _ChatQueue(self.make_bucket(chat_id))
+        else:
+            self._chats.move_to_end(chat_id)
+        chat.requests.append(request)
+        self._unfinished += 1
+        self._idle.clear()
+
+        if not chat.busy:
+            self._schedule(chat_id, chat)
+        return await request.future
+
+    def _evict(self, now: float):
+        """Forget least recently used chats which are idle and can send right now."""
+        chats = self._chats
+        while chats:
+            chat = next(iter(chats.values()))
+            if chat.busy or len(chat) or chat.delay(now):
+                break
+            chats.popitem(last=False)
+
+    def _schedule(self, chat_id: ChatId, chat: _ChatQueue):
+        """Put chat with waiting requests to ready or waiting heap."""
+        now = time.monotonic()
+        delay = chat.delay(now)
+        if delay:
+            heapq.heappush(self._waiting, (now + delay, next(self._seq), chat_id))
+        else:
+            heapq.heappush(self._ready, (chat.head_priority(), next(self._seq), chat_id))
+        self._wakeup.set()
+
+    def _pop_ready(self) -> Optional[tuple[ChatId, _ChatQueue]]:
+        now = time.monotonic()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, _, chat_id = heapq.heappop(self._waiting)
+            chat = self._chats.get(chat_id)
+            if chat is not None and not chat.busy and len(chat):
+                heapq.heappush(self._ready, (chat.head_priority(), next(self._seq), chat_id))
+
+        while self._ready:
+            _, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats.get(chat_id)
+            if chat is None or chat.busy or not len(chat):
+                continue  # duplicated entry
+
+            if chat.delay(now):
+                self._schedule(chat_id, chat)
+                continue
+            return chat_id, chat
+
+    async def _run(self):
+        while True:
+            delay = self.global_bucket.delay()
+            if delay:
+                await asyncio.sleep(delay)
+
+            self._wakeup.clear()
+            popped = self._pop_ready()
+
+            if popped is None:
+                timeout = self._waiting[0][0] - time.monotonic() if self._waiting else None
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue
+
+            self.global_bucket.consume()
+
+            chat_id, chat = popped
+            request = chat.requests.popleft()
+            chat.bucket.consume()
+            chat.busy = True
+
+            task = asyncio.create_task(self._send(chat_id, chat, request))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, chat_id: ChatId, chat: _ChatQueue, request: _Request):
+        stats = self.stats
+        retried = False
+        try:
+            if request.future.cancelled():
+                return
+
+            wait = time.monotonic() - request.submitted
+            try:
+                result = await request.send()
+            except RetryAfter as e:
+                stats.retry_after += 1
+                chat.blocked_until = time.monotonic() + e.timeout
+                if request.retries < self.max_retries:
+                    request.retries += 1
+                    chat.requests.appendleft(request)
+                    retried = True
+                    log.warning(f'Flood control for chat {chat_id}, retry in {e.timeout} seconds')
+                else:
+                    stats.failed += 1
+                    if not request.future.done():
+                        request.future.set_exception(e)
+            except Exception as e:
+                stats.failed += 1
+                if not request.future.done():
+                    request.future.set_exception(e)
+            else:
+                stats.sent += 1
+                stats.total_wait += wait
+                stats.max_wait = max(stats.max_wait, wait)
+                if not request.future.done():
+                    request.future.set_result(result)
+        finally:
+            chat.busy = False
+            if not retried:
+                self._unfinished -= 1
+                if not self._unfinished:
+                    self._idle.set()
+            if len(chat):
+                self._schedule(chat_id, chat)
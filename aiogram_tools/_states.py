@@ -1,14 +1,27 @@
 from __future__ import annotations
 
 import inspect
-from typing import Optional
+import warnings
+from types import MappingProxyType
+from typing import Optional, NamedTuple, Literal
 
 from aiogram import Dispatcher
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup, StatesGroupMeta
 
+Direction = Literal['previous', 'next', 'first', 'last']
+
+
+class Transitions(NamedTuple):
+    """States which can be set after state in its group."""
+    previous: Optional[State]
+    next: Optional[State]
+    first: Optional[State]
+    last: Optional[State]
+
 
 class StatesGroupMeta2(StatesGroupMeta):
+    """Build transitions graph of StatesGroup once, at class creation."""
 
     def __new__(mcs, name, bases, namespace, **kwargs):
         cls = super(StatesGroupMeta, mcs).__new__(mcs, name, bases, namespace)
@@ -32,8 +45,34 @@ class StatesGroupMeta2(StatesGroupMeta):
         cls._states = tuple(states)
         cls._state_names = tuple(state.state for state in states)
 
+        cls._transitions = MappingProxyType(cls._make_transitions(cls._states))
+        mcs._register_states(cls)
+
         return cls
 
+    @staticmethod
+    def _register_states(cls):
+        """Index states of group and nested groups by name (full names of nested states change with parent)."""
+        all_states = cls.all_states
+        if not all_states:
+            return
+
+        states_by_name = StatesGroup2.registered_states
+        transitions = StatesGroup2.registered_transitions
+
+        for state in all_states:
+            old_name = StatesGroup2.registered_names.get(state)
+            if states_by_name.get(old_name) is state:
+                del states_by_name[old_name]
+
+            state_name = state.state
+            if states_by_name.get(state_name, state) is not state:
+                warnings.warn(f'State name {state_name!r} is not unique, states are ambiguous')
+
+            states_by_name[state_name] = state
+            StatesGroup2.registered_names[state] = state_name
+            transitions[state] = state.group._transitions[state]
+
     @property
     def state_ctx(cls) -> FSMContext:
         return Dispatcher.get_current().current_state()
@@ -42,6 +81,24 @@ class StatesGroupMeta2(StatesGroupMeta):
 class StatesGroup2(StatesGroup, metaclass=StatesGroupMeta2):
     all_states_groups_states = set()
 
+    # --- compiled graph of all StatesGroups ---
+    registered_states: dict[str, State] = {}
+    registered_names: dict[State, str] = {}
+    registered_transitions: dict[State, Transitions] = {}
+
+    @classmethod
+    def _make_transitions(cls, states: tuple[State, ...]) -> dict[State, Transitions]:
+        """Return transitions for each state of group."""
+        result = {}
+        for i, state in enumerate(states):
+            result[state] = Transitions(
+                previous=cls.get_state_by_index(states, i - 1),
+                next=cls.get_state_by_index(states, i + 1),
+                first=states[0],
+                last=states[-1],
+            )
+        return result
+
     # --- get methods ---
 
     @classmethod
@@ -55,109 +112,96 @@ class StatesGroup2(StatesGroup, metaclass=StatesGroupMeta2):
 
     @classmethod
     async def get_next_state(cls) -> Optional[State]:
-        state = await cls.get_current_state()
-
-        try:
-            group_states: tuple[State] = state.group.states
-        except AttributeError:
-            return None
-
-        next_step = group_states.index(state) + 1
-        return cls.get_state_by_index(group_states, next_step)
+        return cls.get_transition(await cls.get_current_state(), 'next')
 
     @classmethod
     async def get_previous_state(cls) -> Optional[State]:
-        state = await cls.get_current_state()
-
-        try:
-            group_states: tuple[State] = state.group.states
-        except AttributeError:
-            return None
-
-        previous_step = group_states.index(state) - 1
-        return cls.get_state_by_index(group_states, previous_step)
+        return cls.get_transition(await cls.get_current_state(), 'previous')
 
     @classmethod
     async def get_first_state(cls) -> Optional[State]:
-        state = await cls.get_current_state()
-
-        try:
-            group_states: tuple[State] = state.group.states
-            return group_states[0]
-        except AttributeError:
-            return None
+        return cls.get_transition(await cls.get_current_state(), 'first')
 
     @classmethod
     async def get_last_state(cls) -> Optional[State]:
-        state = await cls.get_current_state()
-
-        try:
-            group_states: tuple[State] = state.group.states
-            return group_states[-1]
-        except AttributeError:
-            return None
+        return cls.get_transition(await cls.get_current_state(), 'last')
 
     # --- set methods ---
 
     @classmethod
     async def set_next_state(cls) -> Optional[State]:
-        current_state = await cls.get_current_state()
-        if current_state:
-            states_group: StatesGroup2 = current_state.group
-            next_state = await states_group.get_next_state()
-            if isinstance(next_state, State):
-                await next_state.set()
-                return next_state
-
-        await cls.state_ctx.set_state(None)
+        return await cls._switch_state('next')
 
     @classmethod
     async def set_previous_state(cls) -> Optional[State]:
-        current_state = await cls.get_current_state()
-        if current_state:
-            states_group: StatesGroup2 = current_state.group
-            previous_state = await states_group.get_previous_state()
-            if isinstance(previous_state, State):
-                await previous_state.set()
-                return previous_state
-
-        await cls.state_ctx.set_state(None)
+        return await cls._switch_state('previous')
 
     @classmethod
     async def set_first_state(cls) -> Optional[State]:
-        current_state = await cls.get_current_state()
-        if current_state:
-            states_group: StatesGroup2 = current_state.group
-            first_state = await states_group.get_first_state()
-            if isinstance(first_state, State):
-                await first_state.set()
-                return first_state
-
-        await cls.state_ctx.set_state(None)
+        return await cls._switch_state('first')
 
     @classmethod
     async def set_last_state(cls) -> Optional[State]:
-        current_state = await cls.get_current_state()
-        if current_state:
-            states_group: StatesGroup2 = current_state.group
-            last_state = await states_group.get_last_state()
-            if isinstance(last_state, State):
-                await last_state.set()
-                return last_state
+        return await cls._switch_state('last')
+
+    @classmethod
+    async def _switch_state(cls, direction: Direction) -> Optional[State]:
+        new_state = cls.get_transition(await cls.get_current_state(), direction)
+        if isinstance(new_state, State):
+            await new_state.set()
+            return new_state
 
         await cls.state_ctx.set_state(None)
 
     # --- Auxiliary methods ---
 
+    @classmethod
+    def get_transition(cls, state: Optional[State], direction: Direction) -> Optional[State]:
+        """Return state to be set after passed one (in its group) or None. Without storage reads."""
+        transitions = cls.registered_transitions.get(state)
+        if transitions is None:
+            return None
+        return getattr(transitions, direction)
+
     @classmethod
     def get_state_by_name(cls, state_name: str) -> Optional[State]:
         """Search for State with state_name in all StatesGroups."""
-        for state in cls.all_states_groups_states:
-            if state.state == state_name:
-                return state
+        return cls.registered_states.get(state_name)
 
     @staticmethod
     def get_state_by_index(group_states: tuple[State], index: int) -> Optional[State]:
         """Return state with passed index from group or None. Exception safety."""
         if 0 <= index < len(group_states):
             return group_states[index]
+
+    @classmethod
+    def export_graph(cls) -> dict[str, dict]:
+        """Return graph of group and all nested groups: {full group name: {states, transitions, parent, childs}}.
+
+        Called on StatesGroup2 - return graph of all StatesGroups.
+        """
+        if cls is StatesGroup2:
+            groups = {state.group for state in cls.registered_transitions}
+        else:
+            groups = set()
+            nested = [cls]
+            while nested:
+                group = nested.pop()
+                groups.add(group)
+                nested.extend(group.childs)
+
+        def name(state: Optional[State]) -> Optional[str]:
+            return state.state if state else None
+
+        graph = {}
+        for group in sorted(groups, key=lambda g: g.__full_group_name__):
+            graph[group.__full_group_name__] = {
+                'states': [state.state for state in group.states],
+                'transitions': {
+                    state.state: {direction: name(target) for direction, target in transitions._asdict().items()}
+                    for state, transitions in group._transitions.items()
+                },
+                'parent': group._parent.__full_group_name__ if group._parent else None,
+                'childs': [child.__full_group_name__ for child in group.childs],
+            }
+        return graph
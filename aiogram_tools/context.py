@@ -1,36 +1,63 @@
 from __future__ import annotations
 
+from contextvars import ContextVar
 from typing import TypeVar
 
 from aiogram import types, Dispatcher
 from aiogram.dispatcher import FSMContext
 from aiogram.utils.mixins import ContextInstanceMixin
 
+from aiogram_tools._fsm import current_fsm_context
+
 T = TypeVar('T')
 
 
 def make_context_obj(obj_type: type[ContextInstanceMixin]) -> T:
+    get_current = obj_type.get_current
+    get_own_attribute = obj_type.__getattribute__
+
     class ContextObject(obj_type):
 
         def __getattribute__(self, item):
-            ctx_obj = obj_type.get_current()
-            if hasattr(ctx_obj, item):
-                return getattr(ctx_obj, item)
-            return super().__getattribute__(item)
+            try:
+                return getattr(get_current(), item)
+            except AttributeError:
+                return get_own_attribute(self, item)
 
     return ContextObject()
 
 
+_current_state: ContextVar[tuple[types.Update, FSMContext]] = ContextVar('current_state')
+
+
+def get_current_state() -> FSMContext:
+    """Return FSMContext for current User+Chat, it's created once per update."""
+    fsm_context = current_fsm_context.get()
+    if fsm_context is not None:
+        return fsm_context
+
+    update = types.Update.get_current()
+    cached = _current_state.get(None)
+
+    if cached is not None and cached[0] is update:
+        return cached[1]
+
+    state_ctx = Dispatcher.get_current().current_state()
+    if update is not None:
+        _current_state.set((update, state_ctx))
+    return state_ctx
+
+
 class ContextStorage(FSMContext):
     # noinspection PyMissingConstructor
     def __init__(self):
         pass
 
     def __getattribute__(self, item):
-        ctx_storage = Dispatcher.get_current().current_state()
-        if hasattr(ctx_storage, item):
-            return getattr(ctx_storage, item)
-        return super().__getattribute__(item)
+        try:
+            return getattr(get_current_state(), item)
+        except AttributeError:
+            return super().__getattribute__(item)
 
 
 update = make_context_obj(types.Update)
@@ -1,20 +1,59 @@
 from __future__ import annotations
 
 import asyncio
-from typing import TypeVar, Optional, List
+from operator import attrgetter
+from typing import TypeVar, Optional, List, Union, Callable, Any
 
 from aiogram import Dispatcher as _Dispatcher, executor
 from aiogram import types
+from aiogram.dispatcher import FSMContext
+from aiogram.dispatcher.handler import Handler
+from aiogram.dispatcher.webhook import WebhookRequestHandler
 from aiogram.types import base
+from aiogram.utils.mixins import ContextInstanceMixin
 
+from aiogram_tools._engine import UpdatesEngine, EngineRequestHandler, FastAckRequestHandler
+from aiogram_tools._fsm import UpdateFSMContext, current_fsm_context
+from aiogram_tools._handler import ButtonsHandler
+from aiogram_tools._metrics import Metrics
+from aiogram_tools._polling import PipelinedPolling
 from aiogram_tools.filters import CallbackQueryButton, InlineQueryButton, MessageButton
 from aiogram_tools.filters import StorageDataFilter
 
 T = TypeVar('T')
+CtxType = type[ContextInstanceMixin]
+UpdateContext = tuple[CtxType, Optional[Callable[[Any], Any]]]
+UpdateRoute = tuple[Handler, tuple[UpdateContext, ...]]
+
+
+def to_list(obj) -> list:
+    """Cast obj to list if it's not yet (None to empty list)."""
+    if obj is None:
+        return []
+    if not isinstance(obj, (list, tuple, set)):
+        return [obj]
+    return list(obj)
 
 
 class Dispatcher(_Dispatcher):
 
+    def __init__(self, *args, fsm_unit_of_work: bool = False, **kwargs):
+        """
+        :param fsm_unit_of_work: read state and data from storage once per update
+            and write changes when update is processed (see UpdateFSMContext)
+        """
+        super().__init__(*args, **kwargs)
+
+        self.fsm_unit_of_work = fsm_unit_of_work
+
+        self.update_routes: dict[str, UpdateRoute] = {}
+        self._setup_update_routes()
+
+        self.engine: Optional[UpdatesEngine] = None
+        self.poller: Optional[PipelinedPolling] = None
+        self.metrics: Optional[Metrics] = None
+        self._metrics_address: Optional[tuple[str, int]] = None
+
     @staticmethod
     def _gen_payload(locals_: dict, exclude: list[str] = None, default_exclude=('self', 'cls')):
         kwargs = locals_.pop('kwargs', {})
@@ -27,7 +66,16 @@ class Dispatcher(_Dispatcher):
                 and value is not None
                 and not key.startswith('_')}
 
+    def _setup_buttons_handlers(self):
+        self.message_handlers = ButtonsHandler(self, middleware_key='message')
+        self.edited_message_handlers = ButtonsHandler(self, middleware_key='edited_message')
+        self.callback_query_handlers = ButtonsHandler(self, middleware_key='callback_query')
+        self.inline_query_handlers = ButtonsHandler(self, middleware_key='inline_query')
+
     def _setup_filters(self):
+        # handlers must be replaced before binding filters to them
+        self._setup_buttons_handlers()
+
         filters_factory = self.filters_factory
         filters_factory.bind(StorageDataFilter, exclude_event_handlers=[
             self.errors_handlers,
@@ -47,9 +95,85 @@ class Dispatcher(_Dispatcher):
 
         super()._setup_filters()
 
+    def setup_engine(self, workers: int = 16, queue_size: int = 1000, dedup_window: int = 0) -> UpdatesEngine:
+        """Process updates concurrently with ordering per chat (see UpdatesEngine)."""
+        self.engine = UpdatesEngine(self, workers, queue_size, dedup_window)
+        return self.engine
+
+    def setup_pipelined_polling(self, timeout: int = 20, min_limit: int = 10, max_limit: int = 100,
+                                workers: int = 16, queue_size: int = 1000) -> PipelinedPolling:
+        """Poll updates to engine with prefetch (see PipelinedPolling), engine is set up if it's not yet."""
+        if self.engine is None:
+            self.setup_engine(workers, queue_size)
+        self.poller = PipelinedPolling(self, timeout, min_limit, max_limit)
+        return self.poller
+
+    def setup_metrics(self, port: Optional[int] = 9100, host: str = '127.0.0.1') -> Metrics:
+        """Measure latency of handlers, filters, middlewares, Bot API methods and storage (see Metrics).
+
+        If port is passed, metrics are served at http://host:port/metrics on startup of run_polling/run_webhook.
+        """
+        self.metrics = Metrics()
+        self.metrics.install(self)
+        self._metrics_address = (host, port) if port else None
+        return self.metrics
+
+    async def _start_metrics(self, *_):
+        if self.metrics is not None and self._metrics_address is not None:
+            await self.metrics.serve(*self._metrics_address)
+
+    async def _close_metrics(self, *_):
+        if self.metrics is not None:
+            await self.metrics.close()
+
+    async def _warm_up_bot(self, *_):
+        """Start background tasks of bot (aiogram_tools.Bot.warm_up), if it has them."""
+        warm_up = getattr(self.bot, 'warm_up', None)
+        if warm_up is not None:
+            warm_up()
+
+    async def _close_engine(self, *_):
+        if self.engine is not None:
+            await self.engine.close()
+
+    async def process_updates(self, updates, fast: Optional[bool] = True):
+        """With engine, updates are enqueued in order of calls and results are returned when all are processed."""
+        if self.engine is None:
+            return await super().process_updates(updates, fast)
+
+        futures = await self.engine.submit_many(updates)
+        return await asyncio.gather(*futures)
+
+    async def start_polling(self, timeout=20, relax=0.1, limit=None, reset_webhook=None,
+                            fast: Optional[bool] = True, error_sleep: int = 5):
+        """With engine, each batch is enqueued before next getUpdates (it keeps order of updates of chat
+        and stops polling while engine is full), `relax` and `fast` are not used."""
+        if self.engine is None:
+            return await super().start_polling(timeout, relax, limit, reset_webhook, fast, error_sleep)
+
+        if self.poller is None:
+            self.poller = PipelinedPolling(self, timeout, min_limit=limit or 100, max_limit=limit or 100)
+        self.poller.error_sleep = error_sleep
+        await self.poller.run(reset_webhook)
+
     def run_polling(self, *, loop=None, skip_updates=False, reset_webhook=True,
-                    on_startup=None, on_shutdown=None, timeout=20, relax=0.1, fast=True):
-        payload = self._gen_payload(locals())
+                    on_startup=None, on_shutdown=None, timeout=20, relax=0.1, fast=True,
+                    workers: Optional[int] = None, queue_size: int = 1000, pipelined: bool = False):
+        """
+        :param workers: process updates by engine with this number of workers,
+            each batch is enqueued before next getUpdates
+        :param pipelined: send next getUpdates as soon as batch is enqueued to engine (engine with 16 workers
+            by default), limit and timeout of requests adapt to load, `relax` is not used
+        """
+        if workers or pipelined:
+            self.setup_engine(workers or 16, queue_size)
+            on_shutdown = [self._close_engine, *to_list(on_shutdown)]
+        if pipelined:
+            self.setup_pipelined_polling(timeout)
+        on_startup = [self._warm_up_bot, self._start_metrics, *to_list(on_startup)]
+        on_shutdown = [*to_list(on_shutdown), self._close_metrics]
+
+        payload = self._gen_payload(locals(), exclude=['workers', 'queue_size', 'pipelined'])
         executor.start_polling(self, **payload)
 
     def run_webhook(self, webhook_host, webhook_path, *, loop=None, skip_updates=None,
@@ -59,7 +183,15 @@ class Dispatcher(_Dispatcher):
                     ip_address: Optional[base.String] = None,
                     max_connections: Optional[base.Integer] = None,
                     allowed_updates: Optional[List[base.String]] = None,
+                    workers: Optional[int] = None, queue_size: int = 1000,
+                    fast_ack: bool = False, dedup_window: int = 4096,
                     **kwargs):
+        """
+        :param workers: process updates by engine with this number of workers
+        :param fast_ack: answer webhook request right after enqueuing update (engine with 16 workers by default),
+            handlers can't answer through webhook response
+        :param dedup_window: number of last update_ids remembered by engine to skip redelivered updates
+        """
         loop = self.loop or asyncio.get_event_loop()
         webhook_task = loop.create_task(self.bot.set_webhook(
             webhook_host + webhook_path,
@@ -72,15 +204,23 @@ class Dispatcher(_Dispatcher):
         if not loop.is_running():
             loop.run_until_complete(webhook_task)
 
-        executor.start_webhook(
-            self,
+        request_handler = WebhookRequestHandler
+        if workers or fast_ack:
+            self.setup_engine(workers or 16, queue_size, dedup_window)
+            on_shutdown = [self._close_engine, *to_list(on_shutdown)]
+            request_handler = FastAckRequestHandler if fast_ack else EngineRequestHandler
+        on_startup = [self._warm_up_bot, self._start_metrics, *to_list(on_startup)]
+        on_shutdown = [*to_list(on_shutdown), self._close_metrics]
+
+        webhook_executor = executor.Executor(self, skip_updates=skip_updates, check_ip=check_ip,
+                                             retry_after=retry_after, loop=loop)
+        webhook_executor.on_startup(on_startup)
+        if on_shutdown is not None:
+            webhook_executor.on_shutdown(on_shutdown)
+
+        webhook_executor.start_webhook(
             webhook_path=webhook_path,
-            loop=loop,
-            skip_updates=skip_updates,
-            on_startup=on_startup,
-            on_shutdown=on_shutdown,
-            check_ip=check_ip,
-            retry_after=retry_after,
+            request_handler=request_handler,
             route_name=route_name,
             **kwargs
         )
@@ -116,6 +256,90 @@ class Dispatcher(_Dispatcher):
         payload = self._gen_payload(locals(), exclude=['custom_filters'])
         return super().inline_handler(*custom_filters, **payload)
 
+    def register_update_route(self, kind: str, handlers: Handler, *context: Union[CtxType, UpdateContext]):
+        """
+        Route updates with filled <kind> field to handlers.
+
+        :param kind: name of Update field (e.g. 'message')
+        :param handlers: Handler to be notified with Update.<kind> object
+        :param context: context types to be set before notifying, as `ctx_type` or `(ctx_type, get_target)`,
+            where get_target receives Update.<kind> object (context object is skipped if target is None)
+        """
+        resolved_context = []
+        for item in context:
+            if not isinstance(item, tuple):
+                item = (item, None)
+            resolved_context.append(item)
+
+        self.update_routes[kind] = (handlers, tuple(resolved_context))
+
+    def _setup_update_routes(self):
+        from_user = attrgetter('from_user')
+        chat = attrgetter('chat')
+
+        self.register_update_route('message', self.message_handlers,
+                                   types.Message, (types.User, from_user), (types.Chat, chat))
+        self.register_update_route('edited_message', self.edited_message_handlers,
+                                   types.Message, (types.User, from_user), (types.Chat, chat))
+        self.register_update_route('channel_post', self.channel_post_handlers,
+                                   types.Message, (types.Chat, chat))
+        self.register_update_route('edited_channel_post', self.edited_channel_post_handlers,
+                                   types.Message, (types.Chat, chat))
+        self.register_update_route('inline_query', self.inline_query_handlers,
+                                   types.InlineQuery, (types.User, from_user))
+        self.register_update_route('chosen_inline_result', self.chosen_inline_result_handlers,
+                                   types.ChosenInlineResult, (types.User, from_user))
+        self.register_update_route('callback_query', self.callback_query_handlers,
+                                   types.CallbackQuery,
+                                   (types.Message, attrgetter('message')),
+                                   (types.Chat, lambda obj: obj.message and obj.message.chat),
+                                   (types.User, from_user))
+        self.register_update_route('shipping_query', self.shipping_query_handlers,
+                                   types.ShippingQuery, (types.User, from_user))
+        self.register_update_route('pre_checkout_query', self.pre_checkout_query_handlers,
+                                   types.PreCheckoutQuery, (types.User, from_user))
+        self.register_update_route('poll', self.poll_handlers,
+                                   types.Poll)
+        self.register_update_route('poll_answer', self.poll_answer_handlers,
+                                   types.PollAnswer, (types.User, attrgetter('user')))
+        self.register_update_route('my_chat_member', self.my_chat_member_handlers,
+                                   types.ChatMemberUpdated, (types.User, from_user))
+        self.register_update_route('chat_member', self.chat_member_handlers,
+                                   types.ChatMemberUpdated, (types.User, from_user))
+
+    def resolve_update(self, update: types.Update) -> Optional[tuple[Any, UpdateRoute]]:
+        """Return filled Update.<kind> object and its route or None."""
+        routes = self.update_routes
+
+        for kind, obj in update.values.items():
+            route = routes.get(kind)
+            if route is not None and obj is not None:
+                return obj, route
+
+    def current_state(self, *,
+                      chat: Union[str, int, None] = None,
+                      user: Union[str, int, None] = None) -> FSMContext:
+        fsm_context = current_fsm_context.get()
+        if fsm_context is not None and fsm_context.is_address(chat, user):
+            return fsm_context
+        return super().current_state(chat=chat, user=user)
+
+    async def _notify_with_fsm_context(self, handlers: Handler, obj):
+        chat = types.Chat.get_current()
+        user = types.User.get_current()
+        if chat is None and user is None:
+            return await handlers.notify(obj)
+
+        fsm_context = UpdateFSMContext(self.storage, chat and chat.id, user and user.id)
+        token = current_fsm_context.set(fsm_context)
+        try:
+            result = await handlers.notify(obj)
+        finally:
+            current_fsm_context.reset(token)
+
+        await fsm_context.flush()  # not on exception: changes of failed update are discarded
+        return result
+
     async def process_update(self, update: types.Update):
         """
         Process single update object
@@ -126,62 +350,19 @@ class Dispatcher(_Dispatcher):
         types.Update.set_current(update)
 
         try:
-            if update.message:
-                types.Message.set_current(update.message)
-                types.User.set_current(update.message.from_user)
-                types.Chat.set_current(update.message.chat)
-                return await self.message_handlers.notify(update.message)
-            if update.edited_message:
-                types.Message.set_current(update.edited_message)
-                types.User.set_current(update.edited_message.from_user)
-                types.Chat.set_current(update.edited_message.chat)
-                return await self.edited_message_handlers.notify(update.edited_message)
-            if update.channel_post:
-                types.Message.set_current(update.channel_post)
-                types.Chat.set_current(update.channel_post.chat)
-                return await self.channel_post_handlers.notify(update.channel_post)
-            if update.edited_channel_post:
-                types.Message.set_current(update.edited_channel_post)
-                types.Chat.set_current(update.edited_channel_post.chat)
-                return await self.edited_channel_post_handlers.notify(update.edited_channel_post)
-            if update.inline_query:
-                types.InlineQuery.set_current(update.inline_query)
-                types.User.set_current(update.inline_query.from_user)
-                return await self.inline_query_handlers.notify(update.inline_query)
-            if update.chosen_inline_result:
-                types.ChosenInlineResult.set_current(update.chosen_inline_result)
-                types.User.set_current(update.chosen_inline_result.from_user)
-                return await self.chosen_inline_result_handlers.notify(update.chosen_inline_result)
-            if update.callback_query:
-                types.CallbackQuery.set_current(update.callback_query)
-                if update.callback_query.message:
-                    types.Message.set_current(update.callback_query.message)
-                    types.Chat.set_current(update.callback_query.message.chat)
-                types.User.set_current(update.callback_query.from_user)
-                return await self.callback_query_handlers.notify(update.callback_query)
-            if update.shipping_query:
-                types.ShippingQuery.set_current(update.shipping_query)
-                types.User.set_current(update.shipping_query.from_user)
-                return await self.shipping_query_handlers.notify(update.shipping_query)
-            if update.pre_checkout_query:
-                types.PreCheckoutQuery.set_current(update.pre_checkout_query)
-                types.User.set_current(update.pre_checkout_query.from_user)
-                return await self.pre_checkout_query_handlers.notify(update.pre_checkout_query)
-            if update.poll:
-                types.Poll.set_current(update.poll)
-                return await self.poll_handlers.notify(update.poll)
-            if update.poll_answer:
-                types.PollAnswer.set_current(update.poll_answer)
-                types.User.set_current(update.poll_answer.user)
-                return await self.poll_answer_handlers.notify(update.poll_answer)
-            if update.my_chat_member:
-                types.ChatMemberUpdated.set_current(update.my_chat_member)
-                types.User.set_current(update.my_chat_member.from_user)
-                return await self.my_chat_member_handlers.notify(update.my_chat_member)
-            if update.chat_member:
-                types.ChatMemberUpdated.set_current(update.chat_member)
-                types.User.set_current(update.chat_member.from_user)
-                return await self.chat_member_handlers.notify(update.chat_member)
+            resolved = self.resolve_update(update)
+            if resolved is None:
+                return
+
+            obj, (handlers, context) = resolved
+            for ctx_type, get_target in context:
+                target = obj if get_target is None else get_target(obj)
+                if target is not None:
+                    ctx_type.set_current(target)
+
+            if not self.fsm_unit_of_work:
+                return await handlers.notify(obj)
+            return await self._notify_with_fsm_context(handlers, obj)
         except Exception as e:
             err = await self.errors_handlers.notify(update, e)
             if err:
@@ -2,13 +2,30 @@ from __future__ import annotations
 
 import re
 from abc import abstractmethod
-from contextlib import suppress
 from typing import Optional, Union
 
 from aiogram import types
 from aiogram.dispatcher.filters import BoundFilter
 from aiogram.types import InlineKeyboardButton, KeyboardButton
 
+from aiogram_tools._callback_data import CallbackSchema
+
+REGEXP_SPECIAL = frozenset('.^$*+?{}[]\\|()')
+QUANTIFIERS = frozenset('*?{')
+
+
+def literal_prefix(regexp: str) -> str:
+    """Return part of regexp which every matching string starts with."""
+    if '|' in regexp:
+        return ''
+
+    for i, char in enumerate(regexp):
+        if char in REGEXP_SPECIAL:
+            if char in QUANTIFIERS:
+                i = max(i - 1, 0)
+            return regexp[:i]
+    return regexp
+
 
 class StorageDataFilter(BoundFilter):
     """Check if all items matches the relevant items in the storage (for current User+Chat)."""
@@ -43,6 +60,13 @@ class StorageDataFilter(BoundFilter):
 
 
 class _ButtonFilter(BoundFilter):
+    """Check if update matches any of buttons.
+
+    Literal buttons are checked by hash lookup, templated (with regexp syntax or {placeholders}) -
+    by single compiled regexp with alternative for each button.
+    CallbackSchema buttons are found by tag lookup and checked first, their data is dict of typed values.
+    """
+
     key = 'button'
 
     @abstractmethod
@@ -62,7 +86,14 @@ class _ButtonFilter(BoundFilter):
         if not isinstance(button, (list, tuple, set)):
             button = [button]
 
-        for item in button:
+        self.schemas: dict[str, tuple[int, CallbackSchema]] = {}
+        orders = []
+
+        for order, item in enumerate(button):
+            if isinstance(item, CallbackSchema):
+                self.schemas.setdefault(item.tag, (order, item))
+                continue
+
             if isinstance(item, str):
                 button_data = item
             else:
@@ -70,22 +101,96 @@ class _ButtonFilter(BoundFilter):
 
             assert isinstance(button_data, str), f'Invalid data for {self.__class__.__name__} filter'
             buttons_regexps.append(self.make_regexp(button_data))
+            orders.append(order)
 
         self.buttons_regexps = buttons_regexps
 
-    def check_one(self, obj, button_regexp: str) -> Optional[dict]:
-        obj_data = self.cast_update(obj)
-        with suppress(TypeError):
-            match = re.fullmatch(button_regexp, obj_data)
-            if match:
-                return {'button': match.groupdict()}
+        self.literals: dict[str, int] = {}
+        self.patterns: list[tuple[int, re.Pattern]] = []
+
+        for order, regexp in zip(orders, buttons_regexps):
+            if literal_prefix(regexp) == regexp:
+                self.literals.setdefault(regexp, order)
+            else:
+                self.patterns.append((order, re.compile(regexp)))
+
+        self._matcher, self._alternatives = self._combine_patterns(self.patterns)
+
+        # literal can be matched by templated button going before it
+        self._literal_results: dict[str, dict] = {}
+        for text, order in self.literals.items():
+            matched = self.match_pattern(text)
+            self._literal_results[text] = matched[1] if matched and matched[0] < order else {}
+
+    @staticmethod
+    def _combine_patterns(patterns: list[tuple[int, re.Pattern]]) -> tuple[Optional[re.Pattern], dict]:
+        """Return single regexp matching any of patterns and {alternative name: (order, {group: name})}."""
+        if len(patterns) < 2 or any(re.search(r'\\\d', p.pattern) for _, p in patterns):
+            return None, {}
+
+        alternatives = {}
+        regexps = []
+
+        for order, pattern in patterns:
+            alt_name = f'_b{order}'
+            groups = {f'{alt_name}_{name}': name for name in pattern.groupindex}
+
+            regexp = re.sub(r'\(\?P([<=])(\w+)', rf'(?P\1{alt_name}_\2', pattern.pattern)
+            regexps.append(f'(?P<{alt_name}>{regexp})')
+            alternatives[alt_name] = (order, groups)
+
+        try:
+            return re.compile('|'.join(regexps)), alternatives
+        except re.error:
+            return None, {}
+
+    def match_pattern(self, text: str) -> Optional[tuple[int, dict]]:
+        """Return order and groups of first templated button matching text."""
+        if self._matcher is None:
+            for order, pattern in self.patterns:
+                match = pattern.fullmatch(text)
+                if match:
+                    return order, match.groupdict()
+            return None
+
+        match = self._matcher.fullmatch(text)
+        if match:
+            order, groups = self._alternatives[match.lastgroup]
+            return order, {name: match.group(alt_group) for alt_group, name in groups.items()}
+
+    def match_schema(self, text: str) -> Optional[tuple[int, dict]]:
+        """Return order and values of CallbackSchema button which text is packed by."""
+        if not self.schemas:
+            return None
+
+        entry = self.schemas.get(CallbackSchema.get_tag(text))
+        if entry is not None:
+            values = entry[1].unpack(text)
+            if values is not None:
+                return entry[0], values
+
+    def match(self, text) -> Optional[dict]:
+        """Return groups of first button matching text or None."""
+        if not isinstance(text, str):
+            return None
+
+        matched = self.match_schema(text)
+        if matched:
+            return matched[1]
+
+        result = self._literal_results.get(text)
+        if result is not None:
+            return dict(result)
+
+        matched = self.match_pattern(text)
+        if matched:
+            return matched[1]
 
     async def check(self, obj) -> Union[dict, bool]:
-        for regexp in self.buttons_regexps:
-            result = self.check_one(obj, regexp)
-            if result:
-                return result
-        return False
+        result = self.match(self.cast_update(obj))
+        if result is None:
+            return False
+        return {'button': result}
 
 
 class CallbackQueryButton(_ButtonFilter):
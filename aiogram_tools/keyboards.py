@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from copy import deepcopy
-from typing import Optional, Union
+from typing import Optional, Union, Iterable, Any
 
 from aiogram import Bot
 from aiogram.types import InlineKeyboardButton, KeyboardButton
 
+from aiogram_tools._callback_data import CallbackSchema
+
 DEEPLINK_BASE = 'https://t.me/{bot_username}?start={start_param}'
 
 
@@ -55,12 +56,87 @@ class InlineButton(InlineKeyboardButton):
                          switch_inline_query_current_chat=switch_iquery_current,
                          )
 
+    @classmethod
+    def with_data(cls, text: str, schema: CallbackSchema, **values) -> InlineButton:
+        """Return button with callback data packed by schema."""
+        return cls(text, callback=schema.pack(**values))
+
     def format(self, *args, **kwargs) -> InlineButton:
         """Return new button with formatted values."""
-        new_button = deepcopy(self)
-
-        for item, value in new_button.values.items():
-            if isinstance(value, str):
-                new_button[item] = value.format(*args, **kwargs)
+        values = {item: value.format(*args, **kwargs) if isinstance(value, str) else value
+                  for item, value in self.values.items()}
 
+        new_button = InlineKeyboardButton.__new__(type(self))
+        InlineKeyboardButton.__init__(new_button, **values)
         return new_button
+
+    def template(self) -> ButtonTemplate:
+        return ButtonTemplate(self)
+
+
+Params = Union[dict[str, Any], tuple, list]
+
+
+class ButtonTemplate:
+    """Button with format fields, which renders to plain dict (button payload) without creating objects.
+
+    Fields without braces are rendered once, at creation.
+    """
+
+    def __init__(self, button: InlineKeyboardButton):
+        self.constant: dict[str, Any] = {}
+        self.formatted: list[tuple[str, str]] = []
+
+        for item, value in button.to_python().items():
+            if isinstance(value, str) and ('{' in value or '}' in value):
+                self.formatted.append((item, value))
+            else:
+                self.constant[item] = value
+
+    def render(self, *args, **kwargs) -> dict[str, Any]:
+        payload = self.constant.copy()
+        for item, value in self.formatted:
+            payload[item] = value.format(*args, **kwargs)
+        return payload
+
+    def render_params(self, params: Params, context: dict[str, Any]) -> dict[str, Any]:
+        """Render with params (dict - kwargs, tuple/list - args), context is added to kwargs."""
+        if isinstance(params, dict):
+            return self.render(**context, **params)
+        return self.render(*params, **context)
+
+
+class KeyboardTemplate:
+    """Inline keyboard of rendered buttons (one per params) between header and footer rows.
+
+    Render to plain reply_markup dict, e.g. for page of list:
+
+        keyboard = KeyboardTemplate(InlineButton('{title}', callback='item:{id}'), row_width=2,
+                                    footer=[[InlineButton('Next', callback='page:{page}')]])
+        await msg.answer('Items', reply_markup=keyboard.render(items, page=2))
+    """
+
+    def __init__(self, button: Union[InlineKeyboardButton, ButtonTemplate], row_width: int = 1,
+                 header: Iterable[Iterable[InlineKeyboardButton]] = (),
+                 footer: Iterable[Iterable[InlineKeyboardButton]] = ()):
+        self.button = button if isinstance(button, ButtonTemplate) else ButtonTemplate(button)
+        self.row_width = row_width
+        self.header = [[ButtonTemplate(button) for button in row] for row in header]
+        self.footer = [[ButtonTemplate(button) for button in row] for row in footer]
+
+    def render(self, params: Iterable[Params], **context) -> dict[str, list[list[dict]]]:
+        """Render button for each params, static rows - with context."""
+        rows = [[button.render(**context) for button in row] for row in self.header]
+
+        render = self.button.render_params
+        row = []
+        for item in params:
+            row.append(render(item, context))
+            if len(row) == self.row_width:
+                rows.append(row)
+                row = []
+        if row:
+            rows.append(row)
+
+        rows += [[button.render(**context) for button in row] for row in self.footer]
+        return {'inline_keyboard': rows}
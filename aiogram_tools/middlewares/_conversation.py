@@ -1,16 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import TypeVar, Union, Optional, Literal
+from typing import TypeVar, Union, Optional, Literal, Awaitable, Callable
 
 from aiogram import types, Dispatcher, Bot
+from aiogram.bot import api
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.middlewares import BaseMiddleware
-from aiogram.dispatcher.storage import FSMContextProxy
+from aiogram.utils.payload import prepare_arg
 
+from aiogram_tools._operations import Operation, apply_operations
 from aiogram_tools._questions import ConvState, ConvStatesGroup, ConvStatesGroupMeta
-from aiogram_tools._questions import Quest, Quests, QuestText, QuestFunc
+from aiogram_tools._questions import Quest, Quests, QuestText, QuestFunc, AsyncFunction
 
 __all__ = ['UpdateData', 'UpdateUserState', 'AnswerOnReturn']
 
@@ -18,6 +22,8 @@ T = TypeVar('T')
 _StorageData = Union[str, int, tuple, dict, None]
 StorageData = Union[_StorageData, list[_StorageData]]
 NewState = Union[Literal['next', 'previous', 'exit'], ConvState, type[ConvStatesGroup], None]
+PreparedQuest = Union[dict, AsyncFunction]  # sendMessage payload or QuestFunc.async_func
+StorageWrite = Callable[[], Awaitable]
 
 
 def to_list(obj) -> list:
@@ -41,6 +47,62 @@ def search_in_results(obj_type: Union[TypeT, tuple[TypeT]], container: list) ->
         return container
 
 
+def prepare_question(question: Quests, chat_id: Union[int, str]) -> list[PreparedQuest]:
+    """Build sendMessage payloads (with serialized keyboards) for each Quest in question."""
+    parse_mode = Bot.get_current().parse_mode
+    prepared = []
+
+    for quest in to_list(question):
+        if isinstance(quest, QuestFunc):
+            prepared.append(quest.async_func)
+            continue
+
+        if isinstance(quest, str):
+            payload = {'chat_id': chat_id, 'text': quest}
+        elif isinstance(quest, QuestText):
+            payload = {'chat_id': chat_id, 'text': quest.text}
+            if quest.keyboard is not None:
+                payload['reply_markup'] = getattr(quest.keyboard, 'serialized', None) or prepare_arg(quest.keyboard)
+        else:
+            continue
+
+        if parse_mode:
+            payload['parse_mode'] = parse_mode
+        prepared.append(payload)
+
+    return prepared
+
+
+async def send_prepared(prepared: list[PreparedQuest], storage_write: Optional[StorageWrite] = None):
+    """Send prepared Quests one by one.
+
+    storage_write() is awaited concurrently with the first message, but before any QuestFunc
+    (it can read storage).
+    """
+    bot = Bot.get_current()
+
+    for quest in prepared:
+        if isinstance(quest, dict):
+            if storage_write is not None:
+                # both are awaited even if one of them fails
+                results = await asyncio.gather(storage_write(), bot.request(api.Methods.SEND_MESSAGE, quest),
+                                               return_exceptions=True)
+                storage_write = None
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+            else:
+                await bot.request(api.Methods.SEND_MESSAGE, quest)
+        else:
+            if storage_write is not None:
+                await storage_write()
+                storage_write = None
+            await quest()
+
+    if storage_write is not None:
+        await storage_write()
+
+
 async def ask_question(question: Quests):
     """Send message for each Quest in question [current Chat]."""
     chat = types.Chat.get_current()
@@ -58,6 +120,13 @@ async def ask_question(question: Quests):
         await ask_quest(q)
 
 
+async def in_order(*funcs: Optional[StorageWrite]):
+    """Call and await passed async functions one by one (skip None)."""
+    for func in funcs:
+        if func is not None:
+            await func()
+
+
 @dataclass
 class UpdateData:
     set_data: dict[str, StorageData] = field(default_factory=dict)
@@ -71,35 +140,20 @@ class UpdateData:
     def state_ctx(self) -> FSMContext:
         return Dispatcher.get_current().current_state()
 
-    def _extend_data(self, proxy: FSMContextProxy, no_error=True):
-        for key, value in self.extend_data.items():
-            if no_error:
-                proxy.setdefault(key, [])
-            proxy[key].extend(to_list(value))
-
-    def _remove_data(self, proxy: FSMContextProxy, no_error=True):
-        for key, value in self.remove_data.items():
-            for item in to_list(value):
-                if no_error:
-                    if item in proxy[key]:
-                        proxy[key].remove(item)
-                else:
-                    proxy[key].remove(item)
-
-    def _delete_keys(self, proxy: FSMContextProxy, no_error=True):
-        for key in to_list(self.delete_keys):
-            if no_error:
-                proxy.pop(key)
-            else:
-                del proxy[key]
+    def to_operations(self) -> list[Operation]:
+        """Return atomic operations on storage data: set, extend (push), remove (pull), delete (unset)."""
+        operations = [Operation('set', key, value) for key, value in self.set_data.items()]
+        operations += [Operation('push', key, to_list(value)) for key, value in self.extend_data.items()]
+        operations += [Operation('pull', key, to_list(value)) for key, value in self.remove_data.items()]
+        operations += [Operation('unset', key) for key in to_list(self.delete_keys)]
+        return operations
 
     async def update_storage(self):
-        """Set, extend or delete items in storage for current User+Chat."""
-        async with self.state_ctx.proxy() as udata:
-            udata.update(self.set_data)
-            self._extend_data(udata)
-            self._remove_data(udata)
-            self._delete_keys(udata)
+        """Set, extend or delete items in storage for current User+Chat.
+
+        Storage applies operations natively, if it supports them (see apply_operations).
+        """
+        await apply_operations(self.state_ctx, self.to_operations())
 
     async def get_new_state(self) -> Union[ConvState, bool, None]:
         """Return new ConvState(...) to be set."""
@@ -110,19 +164,9 @@ class UpdateData:
         if isinstance(self.new_state, ConvStatesGroupMeta):
             return self.new_state.states[0]
 
-        if self.new_state == 'previous':
+        if self.new_state in ('previous', 'next'):
             state = await ConvStatesGroup.get_current_state()
-            if state and state.group:
-                group: ConvStatesGroup = state.group
-                new_state = await group.get_previous_state()
-                return new_state
-
-        if self.new_state == 'next':
-            state = await ConvStatesGroup.get_current_state()
-            if state:
-                group: ConvStatesGroup = state.group
-                new_state = await group.get_next_state()
-                return new_state
+            return ConvStatesGroup.get_transition(state, self.new_state)
 
         if self.new_state == 'exit':
             return None
@@ -130,18 +174,37 @@ class UpdateData:
         if self.new_state is None:
             return False
 
-    async def switch_state(self, new_state: Union[ConvState, bool, None]):
+    async def switch_state(self, new_state: Union[ConvState, bool, None],
+                           storage_write: Optional[StorageWrite] = None, pipelined: bool = False):
         """
         If ConvState(...) passed - set new state and ask question;
         Elif None passed - finish conversation with on_conv_exit;
         Else - do nothing
+
+        storage_write (e.g. update_storage) is called before state switching.
+        If pipelined - storage writes are done concurrently with sending of first message.
         """
         if new_state is None:
-            await self.state_ctx.finish()
-            await ask_question(self.on_conv_exit)
+            write = functools.partial(in_order, storage_write, self.state_ctx.finish)
+            question = self.on_conv_exit
         elif isinstance(new_state, ConvState):
-            await new_state.set()
-            await ask_question(new_state.question)
+            write = functools.partial(in_order, storage_write, new_state.set)
+            question = new_state.question
+        else:
+            await in_order(storage_write)
+            return
+
+        if not pipelined:
+            await write()
+            await ask_question(question)
+            return
+
+        try:
+            prepared = prepare_question(question, types.Chat.get_current().id)
+        except Exception:
+            await write()  # storage is written even if question can't be asked (as without pipelining)
+            raise
+        await send_prepared(prepared, write)
 
 
 class PostMiddleware(BaseMiddleware, ABC):
@@ -167,16 +230,20 @@ class UpdateUserState(PostMiddleware):
       Set new ConvState(...) and ask question; or
       Finish conversation with on_conv_exit; or
       Do nothing
+
+    If UpdateUserState.pipelined is set - storage is updated concurrently with sending of first message
+    of question.
     """
 
+    pipelined = False
+
     @staticmethod
     async def on_post_process_message(msg: types.Message, results: list, *args):
         new_data = search_in_results(UpdateData, results)
 
         if new_data:
-            await new_data.update_storage()
             new_state = await new_data.get_new_state()
-            await new_data.switch_state(new_state)
+            await new_data.switch_state(new_state, new_data.update_storage, UpdateUserState.pipelined)
 
 
 class AnswerOnReturn(PostMiddleware):
@@ -1,31 +1,110 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Union, Optional
+
 from aiogram import types, Bot
 from aiogram.dispatcher.handler import CancelHandler
 from aiogram.dispatcher.middlewares import BaseMiddleware
 from aiogram.utils.exceptions import BadRequest
 
-__all__ = ['CheckMembership']
+__all__ = ['CheckMembership', 'MembershipStats']
+
+
+@dataclass
+class MembershipStats:
+    hits: int = 0
+    misses: int = 0
+    shared: int = 0
+
+    @property
+    def saved_requests(self) -> int:
+        """Number of lookups served without own Bot API request."""
+        return self.hits + self.shared
 
 
 class CheckMembership(BaseMiddleware):
-    """Check if user is member of group or subscribed on channel."""
+    """Check if user is member of group or subscribed on channel (or all of passed chats).
 
-    def __init__(self, chat_username: str, error_text: str = None):
+    Results are cached for `ttl` seconds (negative ones - for `negative_ttl`), at most `max_size`
+    results are kept (least recently used are evicted). Concurrent lookups of one user share one request.
+    """
+
+    def __init__(self, chat_username: Union[str, list[str]], error_text: str = None,
+                 ttl: float = 60, negative_ttl: float = 10, max_size: int = 10_000):
+        chats = chat_username if isinstance(chat_username, list) else [chat_username]
         if not error_text:
-            error_text = f'Error, you are not member of {chat_username}'
-        self.chat = chat_username
+            error_text = f'Error, you are not member of {", ".join(chats)}'
+        self.chats = chats
+        self.chat = chats[0]
         self.error_text = error_text
+
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.stats = MembershipStats()
+        self._cache: OrderedDict[tuple[str, int], tuple[float, bool]] = OrderedDict()
+        self._lookups: dict[tuple[str, int], asyncio.Task] = {}
         super().__init__()
 
     async def is_chat_member(self, user_id: int) -> bool:
-        """Check if user is currently member of chat."""
+        """Check if user is currently member of all chats."""
+        if len(self.chats) == 1:
+            return await self.is_member_of(self.chat, user_id)
+
+        results = await asyncio.gather(*(self.is_member_of(chat, user_id) for chat in self.chats))
+        return all(results)
+
+    async def is_member_of(self, chat: str, user_id: int) -> bool:
+        """Check if user is member of chat, use cached result or running lookup if any."""
+        key = (chat, user_id)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            expires_at, is_member = cached
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                self.stats.hits += 1
+                return is_member
+            del self._cache[key]
+
+        lookup = self._lookups.get(key)
+        if lookup is not None:
+            self.stats.shared += 1
+        else:
+            self.stats.misses += 1
+            lookup = self._lookups[key] = asyncio.create_task(self._lookup(key))
+            lookup.add_done_callback(lambda _: self._lookups.pop(key, None))
+
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, key: tuple[str, int]) -> bool:
+        chat, user_id = key
         bot = Bot.get_current()
         try:
-            chat_member = await bot.get_chat_member(self.chat, user_id)
-            return chat_member.is_chat_member()
+            chat_member = await bot.get_chat_member(chat, user_id)
+            is_member = chat_member.is_chat_member()
         except BadRequest:
-            return False
+            is_member = False
+
+        ttl = self.ttl if is_member else self.negative_ttl
+        self._cache[key] = (time.monotonic() + ttl, is_member)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+        return is_member
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Forget cached results of user (or all)."""
+        if user_id is None:
+            self._cache.clear()
+            return
+        for chat in self.chats:
+            self._cache.pop((chat, user_id), None)
 
     async def on_pre_process_message(self, msg: types.Message, *args):
         is_chat_member = await self.is_chat_member(msg.from_user.id)
@@ -1,51 +1,217 @@
 from __future__ import annotations
 
 import asyncio
+import contextvars
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Hashable, Callable, Awaitable, Union
 
 from aiogram import types, Dispatcher
 from aiogram.dispatcher import DEFAULT_RATE_LIMIT
 from aiogram.dispatcher.handler import CancelHandler, current_handler
 from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiogram.dispatcher.storage import KEY, LAST_CALL, RATE_LIMIT, RESULT, EXCEEDED_COUNT, DELTA
 from aiogram.utils.exceptions import Throttled
 
+__all__ = ['ThrottlingMiddleware', 'RateLimiter', 'UnblockNotifier']
+
+log = logging.getLogger(__name__)
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated', 'called_at', 'exceeded_count', 'refill_time')
+
+    def __init__(self, tokens: float, now: float, refill_time: float):
+        self.tokens = tokens
+        self.updated = now
+        self.called_at = time.time()
+        self.exceeded_count = 0
+        self.refill_time = refill_time
+
+
+class RateLimiter:
+    """In-memory token buckets: `burst` calls at once, then one call per `rate` seconds.
+
+    Buckets are kept in order of last use. Refilled (idle) buckets are evicted
+    on each hit, at most `max_keys` buckets are kept.
+    """
+
+    def __init__(self, burst: int = 1, max_keys: int = 100_000):
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[Hashable, _Bucket] = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            bucket = next(iter(buckets.values()))
+            if len(buckets) <= self.max_keys and now - bucket.updated < bucket.refill_time:
+                break
+            buckets.popitem(last=False)
+
+    def hit(self, key: Hashable, rate: float) -> Optional[Throttled]:
+        """Take token from bucket of key. Return Throttled if bucket is empty."""
+        now = time.monotonic()
+        self._evict(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now, rate * self.burst)
+        else:
+            self._buckets.move_to_end(key)
+            if rate > 0:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) / rate)
+            else:
+                bucket.tokens = self.burst
+            bucket.updated = now
+            bucket.refill_time = rate * self.burst
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.called_at = time.time()
+            bucket.exceeded_count = 1
+            return None
+
+        bucket.exceeded_count += 1
+        retry_after = (1 - bucket.tokens) * rate
+        return Throttled(**{KEY: key, RATE_LIMIT: rate, RESULT: False, EXCEEDED_COUNT: bucket.exceeded_count,
+                            DELTA: rate - retry_after, LAST_CALL: bucket.called_at})
+
+
+class UnblockNotifier:
+    """Call coroutine functions at deadlines with one timer for all keys.
+
+    Scheduling for key replaces its pending call, so only the last flooded call of key is notified.
+    """
+
+    def __init__(self):
+        self._pending: dict[Hashable, tuple[float, Callable[[], Awaitable], contextvars.Context]] = {}
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._counter = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable[[], Awaitable]):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(delay, 0)
+
+        self._pending[key] = (deadline, callback, contextvars.copy_context())
+        self._counter += 1
+        heapq.heappush(self._heap, (deadline, self._counter, key))
+
+        if self._timer_at is None or deadline < self._timer_at:
+            self._arm(loop, deadline)
+
+    def _arm(self, loop: asyncio.AbstractEventLoop, deadline: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(deadline, self._fire, loop)
+        self._timer_at = deadline
+
+    def _fire(self, loop: asyncio.AbstractEventLoop):
+        self._timer = self._timer_at = None
+        now = loop.time()
+        heap = self._heap
+
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            pending = self._pending.get(key)
+            if pending is None or pending[0] != deadline:
+                continue  # rescheduled later
+
+            del self._pending[key]
+            _, callback, context = pending
+            task = context.run(loop.create_task, callback())
+            task.add_done_callback(self._log_error)
+
+        if heap:
+            self._arm(loop, heap[0][0])
+
+    @staticmethod
+    def _log_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            log.error('Cause exception while sending unblock notification', exc_info=task.exception())
+
 
 class ThrottlingMiddleware(BaseMiddleware):
-    """Simple middleware"""
+    """Throttle messages and callback queries per user and handler.
+
+    By default throttling state is kept in FSM storage (Dispatcher.throttle).
+    With in_memory=True it is kept in RateLimiter of middleware - without storage calls.
+    Unblock notifications are sent by one shared timer.
+    """
 
     def __init__(self, on_throttled_text: str, on_unblocked_text: str,
-                 limit=DEFAULT_RATE_LIMIT, key_prefix='antiflood_'):
+                 limit=DEFAULT_RATE_LIMIT, key_prefix='antiflood_',
+                 in_memory: bool = False, burst: int = 1, max_keys: int = 100_000):
         self.on_throttled_text = on_throttled_text
         self.on_unblocked_text = on_unblocked_text
         self.rate_limit = limit
         self.prefix = key_prefix
+        self.limiter = RateLimiter(burst, max_keys) if in_memory else None
+        self.notifier = UnblockNotifier()
         super().__init__()
 
-    async def on_process_message(self, message: types.Message, _):
+    def get_key(self, default: str) -> tuple[str, float]:
+        """Return throttling key and rate limit of current handler."""
         handler = current_handler.get()
-        dispatcher = Dispatcher.get_current()
         if handler:
             limit = getattr(handler, 'throttling_rate_limit', self.rate_limit)
             key = getattr(handler, 'throttling_key', f"{self.prefix}_{handler.__name__}")
         else:
             limit = self.rate_limit
-            key = f"{self.prefix}_message"
+            key = f"{self.prefix}_{default}"
+        return key, limit
+
+    async def throttle(self, key: str, limit: float) -> Optional[Throttled]:
+        """Return Throttled if current user exceeded limit of key."""
+        chat, user = types.Chat.get_current(), types.User.get_current()
+        chat_id, user_id = chat.id if chat else None, user.id if user else None
+
+        if self.limiter is not None:
+            throttled = self.limiter.hit((key, chat_id, user_id), limit)
+            if throttled is not None:
+                throttled.key, throttled.chat, throttled.user = key, chat_id, user_id
+            return throttled
+
         try:
-            await dispatcher.throttle(key, rate=limit)
+            await Dispatcher.get_current().throttle(key, rate=limit, chat_id=chat_id, user_id=user_id,
+                                                   no_error=False)
         except Throttled as t:
-            await self.message_throttled(message, t)
+            return t
+
+    async def on_process_message(self, message: types.Message, _):
+        throttled = await self.throttle(*self.get_key('message'))
+        if throttled is not None:
+            await self.message_throttled(message, throttled)
+            raise CancelHandler()
+
+    async def on_process_callback_query(self, query: types.CallbackQuery, _):
+        throttled = await self.throttle(*self.get_key('callback_query'))
+        if throttled is not None:
+            await self.callback_query_throttled(query, throttled)
             raise CancelHandler()
 
     async def message_throttled(self, message: types.Message, throttled: Throttled):
-        handler = current_handler.get()
-        dispatcher = Dispatcher.get_current()
-        if handler:
-            key = getattr(handler, 'throttling_key', f"{self.prefix}_{handler.__name__}")
-        else:
-            key = f"{self.prefix}_message"
-        delta = throttled.rate - throttled.delta
         if throttled.exceeded_count <= 2:
             await message.reply(self.on_throttled_text)
-        await asyncio.sleep(delta)
-        thr = await dispatcher.check_key(key)
-        if thr.exceeded_count == throttled.exceeded_count:
-            await message.reply(self.on_unblocked_text)
+        self.schedule_unblocked(throttled, lambda: message.reply(self.on_unblocked_text))
+
+    async def callback_query_throttled(self, query: types.CallbackQuery, throttled: Throttled):
+        await query.answer(self.on_throttled_text if throttled.exceeded_count <= 2 else None)
+        if query.message:
+            self.schedule_unblocked(throttled, lambda: query.message.answer(self.on_unblocked_text))
+
+    def schedule_unblocked(self, throttled: Throttled,
+                           send: Callable[[], Awaitable[Union[types.Message, bool]]]):
+        """Call send when limit expires, if user doesn't flood again before."""
+        key = (throttled.key, throttled.chat, throttled.user)
+        self.notifier.schedule(key, throttled.rate - throttled.delta, send)
@@ -0,0 +1,396 @@
+"""Benchmarks for the dispatch hot path of aiogram_tools.
+
+Drive Dispatcher.process_update with synthetic updates against MemoryStorage and stubbed Bot.
+Each result is printed as one JSON line, e.g.:
+
+    python -m benchmarks.dispatch --updates 2000 > bench.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Iterable, Optional
+
+from aiogram import Bot, types, Dispatcher as _Dispatcher
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher import FSMContext
+
+from aiogram_tools import Dispatcher, context
+from aiogram_tools._callback_data import CallbackSchema
+from aiogram_tools._currents import CurrentObjects
+from aiogram_tools.filters import CallbackQueryButton
+from aiogram_tools.middlewares import ThrottlingMiddleware
+from aiogram_tools.middlewares._conversation import UpdateUserState, AnswerOnReturn
+from aiogram_tools.middlewares._membership import CheckMembership
+
+CHAT_ID = 1000
+USER = {'id': CHAT_ID, 'is_bot': False, 'first_name': 'Bench'}
+CHAT = {'id': CHAT_ID, 'type': 'private'}
+MESSAGE = {'message_id': 1, 'date': 0, 'chat': CHAT, 'from': USER, 'text': ''}
+
+
+class StubBot(Bot):
+    """Bot which answers all requests without network."""
+
+    def __init__(self):
+        super().__init__('1:stub', validate_token=False)
+        self.requests = 0
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        self.requests += 1
+        if method == 'getChatMember':
+            return {'user': USER, 'status': 'member'}
+        if method in ('sendMessage', 'editMessageText'):
+            return {**MESSAGE, 'text': (data or {}).get('text', '')}
+        return True
+
+
+def make_update(kind: str, text: str, update_id: int = 1) -> types.Update:
+    if kind == 'message':
+        obj = {**MESSAGE, 'text': text}
+    elif kind == 'callback_query':
+        obj = {'id': '1', 'from': USER, 'chat_instance': '1', 'message': MESSAGE, 'data': text}
+    elif kind == 'inline_query':
+        obj = {'id': '1', 'from': USER, 'query': text, 'offset': ''}
+    else:
+        raise ValueError(f'Unknown update kind: {kind}')
+    return types.Update(**{'update_id': update_id, kind: obj})
+
+
+def register(dp: Dispatcher, kind: str, callback: Callable, **filters):
+    if kind == 'message':
+        dp.message_handler(**filters)(callback)
+    elif kind == 'callback_query':
+        dp.callback_query_handler(**filters)(callback)
+    elif kind == 'inline_query':
+        dp.inline_handler(**filters)(callback)
+
+
+async def noop(*_, **__):
+    pass
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def measure(process: Callable, updates: Iterable[types.Update], warmup: int = 50) -> dict:
+    updates = list(updates)
+    for update in updates[:warmup]:
+        await process(update)
+
+    latencies = []
+    started = time.perf_counter()
+    for update in updates:
+        t = time.perf_counter()
+        await process(update)
+        latencies.append(time.perf_counter() - t)
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'updates': len(updates),
+        'throughput': len(updates) / total,
+        'mean_us': statistics.mean(latencies) * 1e6,
+        'p50_us': percentile(latencies, 50) * 1e6,
+        'p90_us': percentile(latencies, 90) * 1e6,
+        'p99_us': percentile(latencies, 99) * 1e6,
+    }
+
+
+def make_dispatcher(middlewares: Iterable = ()) -> Dispatcher:
+    bot = StubBot()
+    dp = Dispatcher(bot, storage=MemoryStorage(), throttling_rate_limit=0)
+    for middleware in middlewares:
+        dp.middleware.setup(middleware)
+
+    Bot.set_current(bot)
+    _Dispatcher.set_current(dp)
+    return dp
+
+
+async def bench_routing(count: int):
+    """Routing table of Dispatcher.process_update against aiogram's chain of if."""
+    for kind in ('message', 'callback_query', 'inline_query'):
+        dp = make_dispatcher()
+        updates = [make_update(kind, 'x', i) for i in range(count)]
+
+        for name, process in [
+            ('aiogram', lambda u: _Dispatcher.process_update(dp, u)),
+            ('aiogram_tools', dp.process_update),
+        ]:
+            yield {'bench': 'routing', 'impl': name, 'kind': kind, **await measure(process, updates)}
+
+
+async def bench_handlers(count: int, sizes: list[int]):
+    """Handlers with `text=` filter, only last one matches."""
+    for kind, size in itertools.product(('message', 'callback_query', 'inline_query'), sizes):
+        dp = make_dispatcher()
+        for i in range(size):
+            register(dp, kind, noop, text=f'text_{i}')
+
+        updates = [make_update(kind, f'text_{size - 1}', i) for i in range(count)]
+        yield {'bench': 'handlers', 'kind': kind, 'size': size, **await measure(dp.process_update, updates)}
+
+
+async def bench_buttons(count: int, sizes: list[int]):
+    """Handlers with `button=` filter (half literal, half templated), only last one matches."""
+    for kind, size in itertools.product(('message', 'callback_query', 'inline_query'), sizes):
+        dp = make_dispatcher()
+        for i in range(size):
+            button = f'button_{i}' if i % 2 else f'button_{i}:{{item_id}}'
+            register(dp, kind, noop, button=button)
+
+        last = size - 1
+        text = f'button_{last}' if last % 2 else f'button_{last}:42'
+        updates = [make_update(kind, text, i) for i in range(count)]
+        yield {'bench': 'buttons', 'kind': kind, 'size': size, **await measure(dp.process_update, updates)}
+
+
+def legacy_button_check(button_filter, obj):
+    """Matching of _ButtonFilter before precompilation: re.fullmatch for each button in turn."""
+    for regexp in button_filter.buttons_regexps:
+        match = re.fullmatch(regexp, button_filter.cast_update(obj))
+        if match:
+            return {'button': match.groupdict()}
+    return False
+
+
+async def bench_button_filter(count: int, sizes: list[int]):
+    """Single `button=` filter holding many buttons, last literal or last templated one matches."""
+    for size, matching in itertools.product(sizes, ('literal', 'templated')):
+        buttons = [f'button_{i}' if i % 2 else f'button_{i}:{{item_id}}' for i in range(size)]
+        button_filter = CallbackQueryButton(buttons)
+
+        last = max(i for i in range(size) if (i % 2 == 1) == (matching == 'literal')) if size > 1 else 0
+        text = f'button_{last}' if last % 2 else f'button_{last}:42'
+        updates = [make_update('callback_query', text, i) for i in range(count)]
+
+        async def legacy(u):
+            return legacy_button_check(button_filter, u.callback_query)
+
+        for name, process in [
+            ('legacy', legacy),
+            ('compiled', lambda u: button_filter.check(u.callback_query)),
+        ]:
+            yield {'bench': 'button_filter', 'impl': name, 'size': size, 'matching': matching,
+                   **await measure(process, updates)}
+
+
+async def bench_callback_data(count: int, sizes: list[int]):
+    """Callback handlers with templated `button=` against CallbackSchema buttons, only last one matches."""
+    for size in sizes:
+        template_dp, schema_dp = make_dispatcher(), make_dispatcher()
+        schemas = [CallbackSchema(f'b{i}', item_id=int, page=int) for i in range(size)]
+        for i, schema in enumerate(schemas):
+            register(template_dp, 'callback_query', noop, button=f'button_{i}:{{item_id}}:{{page}}')
+            register(schema_dp, 'callback_query', noop, button=schema)
+
+        for name, dp, text in [
+            ('template', template_dp, f'button_{size - 1}:123456:7'),
+            ('schema', schema_dp, schemas[-1].pack(item_id=123456, page=7)),
+        ]:
+            updates = [make_update('callback_query', text, i) for i in range(count)]
+            yield {'bench': 'callback_data', 'impl': name, 'size': size, 'data_bytes': len(text),
+                   **await measure(dp.process_update, updates)}
+
+
+async def bench_storage(count: int, sizes: list[int]):
+    """Handlers with `storage=` filter, only last one matches."""
+    for size in sizes:
+        dp = make_dispatcher()
+        await dp.storage.set_data(chat=CHAT_ID, user=CHAT_ID, data={'key': size - 1, 'other': 'value'})
+        for i in range(size):
+            register(dp, 'message', noop, storage={'key': i})
+
+        updates = [make_update('message', 'x', i) for i in range(count)]
+        yield {'bench': 'storage', 'kind': 'message', 'size': size, **await measure(dp.process_update, updates)}
+
+
+def legacy_decorate_handler(handler):
+    """CurrentObjects.decorate_handler before injection plans: reflection and sequential awaits on each call."""
+
+    async def wrapper(*args, **kwargs):
+        resolved_kwargs = {}
+        for arg in inspect.getfullargspec(handler).args:
+            if arg in kwargs:
+                resolved_kwargs[arg] = kwargs[arg]
+            elif arg in CurrentObjects.keywords:
+                resolved_kwargs[arg] = await CurrentObjects.get(arg)
+        return await handler(**resolved_kwargs)
+
+    return wrapper
+
+
+async def bench_injection(count: int):
+    """Handler with 8 injected current objects (3 of them read storage)."""
+
+    async def handler(msg, user_id, chat_id, text, msg_id, sdata, state, raw_state):
+        pass
+
+    for name, decorate in [
+        ('legacy', legacy_decorate_handler),
+        ('plan', CurrentObjects.decorate_handler),
+    ]:
+        dp = make_dispatcher()
+        dp.message_handler()(decorate(handler))
+
+        updates = [make_update('message', 'x', i) for i in range(count)]
+        yield {'bench': 'injection', 'impl': name, **await measure(dp.process_update, updates)}
+
+
+def legacy_make_context_obj(obj_type):
+    """Proxy of aiogram_tools.context before rework: get_current, hasattr and getattr on each access."""
+
+    class ContextObject(obj_type):
+
+        def __getattribute__(self, item):
+            ctx_obj = obj_type.get_current()
+            if hasattr(ctx_obj, item):
+                return getattr(ctx_obj, item)
+            return super().__getattribute__(item)
+
+    return ContextObject()
+
+
+class LegacyContextStorage(FSMContext):
+    # noinspection PyMissingConstructor
+    def __init__(self):
+        pass
+
+    def __getattribute__(self, item):
+        ctx_storage = _Dispatcher.get_current().current_state()
+        if hasattr(ctx_storage, item):
+            return getattr(ctx_storage, item)
+        return super().__getattribute__(item)
+
+
+async def bench_context(count: int, accesses: int = 100):
+    """Attribute access through context proxies against direct get_current()."""
+    dp = make_dispatcher()
+    update = make_update('message', 'x')
+    dp.message_handler()(noop)
+    await dp.process_update(update)  # set current objects
+
+    legacy_message = legacy_make_context_obj(types.Message)
+    legacy_storage = LegacyContextStorage()
+
+    async def direct_message(_):
+        for _ in range(accesses):
+            types.Message.get_current().text
+
+    async def proxy_message(_):
+        for _ in range(accesses):
+            context.message.text
+
+    async def legacy_proxy_message(_):
+        for _ in range(accesses):
+            legacy_message.text
+
+    async def direct_storage(_):
+        for _ in range(accesses):
+            dp.current_state().user
+
+    async def proxy_storage(_):
+        for _ in range(accesses):
+            context.storage.user
+
+    async def legacy_proxy_storage(_):
+        for _ in range(accesses):
+            legacy_storage.user
+
+    for name, process in [
+        ('direct_message', direct_message),
+        ('proxy_message', proxy_message),
+        ('legacy_proxy_message', legacy_proxy_message),
+        ('direct_storage', direct_storage),
+        ('proxy_storage', proxy_storage),
+        ('legacy_proxy_storage', legacy_proxy_storage),
+    ]:
+        yield {'bench': 'context', 'impl': name, 'accesses': accesses, **await measure(process, [update] * count)}
+
+
+MIDDLEWARES: dict[str, Callable[[], object]] = {
+    'UpdateUserState': UpdateUserState,
+    'AnswerOnReturn': AnswerOnReturn,
+    'ThrottlingMiddleware': lambda: ThrottlingMiddleware('throttled', 'unblocked', limit=0),
+    'CheckMembership': lambda: CheckMembership('@channel'),
+}
+
+
+async def bench_middlewares(count: int):
+    """Every middleware alone and all together, single matching handler."""
+    sets = [[name] for name in MIDDLEWARES] + [list(MIDDLEWARES)]
+
+    for kind, names in itertools.product(('message', 'callback_query'), sets):
+        dp = make_dispatcher(MIDDLEWARES[name]() for name in names)
+        register(dp, kind, noop)
+
+        updates = [make_update(kind, 'x', i) for i in range(count)]
+        result = await measure(dp.process_update, updates)
+        yield {'bench': 'middlewares', 'kind': kind, 'middlewares': names,
+               'api_requests': dp.bot.requests, **result}
+
+
+async def bench_metrics(count: int):
+    """All middlewares and handler with `button=` filter, without and with Metrics installed."""
+    for kind, impl in itertools.product(('message', 'callback_query'), ('off', 'on')):
+        dp = make_dispatcher(middleware() for middleware in MIDDLEWARES.values())
+        register(dp, kind, noop, button='x')
+        if impl == 'on':
+            dp.setup_metrics(port=None)
+
+        updates = [make_update(kind, 'x', i) for i in range(count)]
+        result = await measure(dp.updates_handler.notify, updates)
+        yield {'bench': 'metrics', 'kind': kind, 'impl': impl,
+               'series': len(dp.metrics.histograms) if dp.metrics else 0, **result}
+
+
+BENCHES = ['routing', 'handlers', 'buttons', 'button_filter', 'callback_data', 'storage', 'middlewares', 'injection',
+           'context', 'metrics']
+
+
+async def run(benches: list[str], count: int, sizes: list[int], output=sys.stdout):
+    generators = {
+        'routing': lambda: bench_routing(count),
+        'handlers': lambda: bench_handlers(count, sizes),
+        'buttons': lambda: bench_buttons(count, sizes),
+        'button_filter': lambda: bench_button_filter(count, sizes),
+        'callback_data': lambda: bench_callback_data(count, sizes),
+        'storage': lambda: bench_storage(count, sizes),
+        'middlewares': lambda: bench_middlewares(count),
+        'injection': lambda: bench_injection(count),
+        'context': lambda: bench_context(count),
+        'metrics': lambda: bench_metrics(count),
+    }
+
+    for name in benches:
+        async for result in generators[name]():
+            print(json.dumps(result), file=output, flush=True)
+
+
+def main(args: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benches', nargs='*', metavar='bench', help=f'any of: {", ".join(BENCHES)}')
+    parser.add_argument('--updates', type=int, default=1000, help='updates per measurement')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 500],
+                        help='numbers of handlers/filters')
+    options = parser.parse_args(args)
+
+    unknown = set(options.benches) - set(BENCHES)
+    if unknown:
+        parser.error(f'unknown benches: {", ".join(sorted(unknown))}')
+
+    asyncio.run(run(options.benches or BENCHES, options.updates, options.sizes))
+
+
+if __name__ == '__main__':
+    main()
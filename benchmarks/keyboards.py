@@ -0,0 +1,78 @@
+"""Benchmarks for rendering of paginated inline keyboards.
+
+Compare KeyboardTemplate with building keyboard of InlineButton.format() (previous one used deepcopy).
+Each result is printed as one JSON line, e.g.:
+
+    python -m benchmarks.keyboards --keyboards 1000 > keyboards.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import sys
+import time
+from typing import Callable, Optional
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.payload import prepare_arg
+
+from aiogram_tools.keyboards import InlineButton, KeyboardTemplate
+
+BUTTON = InlineButton('{title} ({price}$)', callback='item:{id}:{page}')
+NEXT = InlineButton('Next', callback='page:{page}')
+
+
+def legacy_format(button: InlineButton, *args, **kwargs) -> InlineButton:
+    """InlineButton.format with deepcopy."""
+    new_button = copy.deepcopy(button)
+    for item, value in new_button.values.items():
+        if isinstance(value, str):
+            new_button[item] = value.format(*args, **kwargs)
+    return new_button
+
+
+def make_items(count: int) -> list[dict]:
+    return [{'title': f'Item {i}', 'price': i * 10, 'id': i} for i in range(count)]
+
+
+def build_markup(format_button: Callable, items: list[dict], page: int) -> str:
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    keyboard.add(*(format_button(BUTTON, **item, page=page) for item in items))
+    keyboard.row(format_button(NEXT, page=page + 1))
+    return prepare_arg(keyboard)
+
+
+def measure(render: Callable[[], str], count: int) -> dict:
+    started = time.perf_counter()
+    for _ in range(count):
+        render()
+    total = time.perf_counter() - started
+    return {'keyboards': count, 'total_s': total, 'per_second': count / total, 'mean_us': total / count * 1e6}
+
+
+def run(count: int, sizes: list[int], output=sys.stdout):
+    template = KeyboardTemplate(BUTTON, row_width=2, footer=[[NEXT]])
+
+    for size in sizes:
+        items = make_items(size)
+        for name, render in [
+            ('format_deepcopy', lambda: build_markup(legacy_format, items, 1)),
+            ('format', lambda: build_markup(InlineButton.format, items, 1)),
+            ('template', lambda: prepare_arg(template.render(items, page=1))),
+        ]:
+            result = {'bench': 'keyboard', 'impl': name, 'buttons': size, **measure(render, count)}
+            print(json.dumps(result), file=output, flush=True)
+
+
+def main(args: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keyboards', type=int, default=1000, help='keyboards per measurement')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100], help='buttons per keyboard')
+    options = parser.parse_args(args)
+
+    run(options.keyboards, options.sizes)
+
+
+if __name__ == '__main__':
+    main()
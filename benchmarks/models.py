@@ -0,0 +1,164 @@
+"""Benchmarks for loading and dumping of DataModel documents.
+
+Compare codecs of DataModel with previous implementation (dataclasses.fields per key, asdict)
+and memory of instances with and without __slots__. Each result is printed as one JSON line, e.g.:
+
+    python -m benchmarks.models --documents 100000 > models.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from bson import ObjectId
+
+from aiogram_tools._models import DataModel, MongoModel, with_slots
+
+
+@dataclass
+class Address(DataModel):
+    city: str = ''
+    street: str = ''
+    tags: list[str] = field(default_factory=list)
+
+
+@dataclass
+class User(MongoModel):
+    name: str = ''
+    age: int = 0
+    language: str = 'en'
+    balance: float = 0.0
+    is_admin: bool = False
+    address: Optional[Address] = None
+    history: list[str] = field(default_factory=list)
+
+
+@with_slots
+@dataclass
+class SlottedUser(MongoModel):
+    name: str = ''
+    age: int = 0
+    language: str = 'en'
+    balance: float = 0.0
+    is_admin: bool = False
+    address: Optional[Address] = None
+    history: list[str] = field(default_factory=list)
+
+
+def legacy_from_dict(cls, obj_data: dict):
+    """DataModel.from_dict before codecs."""
+    if not obj_data:
+        return None
+
+    resolved_data = {}
+    for key, value in obj_data.items():
+        if key in [f.name for f in dataclasses.fields(cls)]:
+            resolved_data[key] = value
+
+    for _field, value in resolved_data.items():
+        field_type = cls.__annotations__.get(_field)
+        factory = getattr(field_type, 'from_dict', None)
+        if factory:
+            resolved_data[_field] = factory(value)
+
+    return cls(**resolved_data)
+
+
+def make_documents(count: int) -> list[dict]:
+    return [
+        {
+            '_id': ObjectId(),
+            'name': f'user_{i}',
+            'age': i % 90,
+            'language': 'en',
+            'balance': i / 10,
+            'is_admin': False,
+            'address': {'city': 'City', 'street': f'Street {i}', 'tags': ['home']},
+            'history': ['start', 'menu'],
+            'unknown_key': i,
+        }
+        for i in range(count)
+    ]
+
+
+def measure(func: Callable, items: list) -> dict:
+    gc.collect()
+    started = time.perf_counter()
+    for item in items:
+        func(item)
+    total = time.perf_counter() - started
+    return {'documents': len(items), 'total_s': total, 'per_second': len(items) / total}
+
+
+def bench_load(documents: list[dict]):
+    """Documents to models."""
+    for name, load in [
+        ('legacy', lambda doc: legacy_from_dict(User, doc)),
+        ('codec', User.from_dict),
+        ('codec_slots', SlottedUser.from_dict),
+    ]:
+        yield {'bench': 'load', 'impl': name, **measure(load, documents)}
+
+
+def bench_dump(documents: list[dict]):
+    """Models to dicts."""
+    users = [User.from_dict(doc) for doc in documents]
+    for name, dump in [
+        ('asdict', dataclasses.asdict),
+        ('codec', User.to_dict),
+    ]:
+        yield {'bench': 'dump', 'impl': name, **measure(dump, users)}
+
+
+def bench_memory(documents: list[dict]):
+    """Memory of loaded models."""
+    for name, cls in [('dict', User), ('slots', SlottedUser)]:
+        gc.collect()
+        tracemalloc.start()
+        users = [cls.from_dict(doc) for doc in documents]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        yield {'bench': 'memory', 'impl': name, 'documents': len(users),
+               'total_mb': size / 2 ** 20, 'bytes_per_document': size / len(users)}
+        del users
+
+
+BENCHES = ['load', 'dump', 'memory']
+
+
+def run(benches: list[str], count: int, output=sys.stdout):
+    documents = make_documents(count)
+    generators = {
+        'load': lambda: bench_load(documents),
+        'dump': lambda: bench_dump(documents),
+        'memory': lambda: bench_memory(documents),
+    }
+
+    for name in benches:
+        for result in generators[name]():
+            print(json.dumps(result), file=output, flush=True)
+
+
+def main(args: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benches', nargs='*', metavar='bench', help=f'any of: {", ".join(BENCHES)}')
+    parser.add_argument('--documents', type=int, default=100_000, help='documents per measurement')
+    options = parser.parse_args(args)
+
+    unknown = set(options.benches) - set(BENCHES)
+    if unknown:
+        parser.error(f'unknown benches: {", ".join(sorted(unknown))}')
+
+    run(options.benches or BENCHES, options.documents)
+
+
+if __name__ == '__main__':
+    main()
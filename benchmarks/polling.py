@@ -0,0 +1,143 @@
+"""Benchmarks for long polling against fake Bot API server.
+
+Fake server answers getUpdates after `--latency` seconds (round trip to Telegram) with updates
+of its stream. Compare aiogram's polling loop, polling to engine (fixed limit) and pipelined polling.
+Each result is printed as one JSON line, e.g.:
+
+    python -m benchmarks.polling --updates 5000 --latency 0.05 > polling.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Optional
+
+from aiogram import Bot, Dispatcher as _Dispatcher
+from aiogram.bot.api import TelegramAPIServer
+from aiohttp import web
+
+from aiogram_tools import Dispatcher
+
+HOST = '127.0.0.1'
+USER = {'id': 1, 'is_bot': False, 'first_name': 'Bench'}
+
+
+class FakeBotAPI:
+    """Bot API server with stream of `count` text messages from `chats` chats."""
+
+    def __init__(self, count: int, chats: int, latency: float):
+        self.count = count
+        self.chats = chats
+        self.latency = latency
+        self.committed = 0
+        self.requests = 0
+
+    def make_update(self, update_id: int) -> dict:
+        chat = {'id': update_id % self.chats + 1, 'type': 'private'}
+        message = {'message_id': update_id, 'date': int(time.time()), 'chat': chat, 'from': USER, 'text': 'x'}
+        return {'update_id': update_id, 'message': message}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        data = dict(await request.post())
+        if method != 'getUpdates':
+            return web.json_response({'ok': True, 'result': True})
+
+        self.requests += 1
+        offset = int(data.get('offset') or 1)
+        limit = int(data.get('limit') or 100)
+        self.committed = max(self.committed, offset - 1)
+
+        await asyncio.sleep(self.latency)
+        updates = [self.make_update(i) for i in range(offset, min(offset + limit, self.count + 1))]
+        return web.json_response({'ok': True, 'result': updates})
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, HOST, port).start()
+        return runner
+
+
+async def bench_throughput(count: int, chats: int, latency: float, handler_delay: float, port: int):
+    """Time until all updates of stream are processed."""
+    for impl in ('aiogram', 'engine', 'pipelined'):
+        server = FakeBotAPI(count, chats, latency)
+        runner = await server.start(port)
+
+        bot = Bot('1:bench', validate_token=False, server=TelegramAPIServer.from_base(f'http://{HOST}:{port}'))
+        dp = Dispatcher(bot)
+        Bot.set_current(bot)
+        _Dispatcher.set_current(dp)
+
+        if impl == 'engine':
+            dp.setup_engine()
+        elif impl == 'pipelined':
+            dp.setup_pipelined_polling()
+
+        processed = 0
+        done = asyncio.Event()
+
+        @dp.message_handler()
+        async def handler(_):
+            nonlocal processed
+            await asyncio.sleep(handler_delay)
+            processed += 1
+            if processed == count:
+                done.set()
+
+        started = time.perf_counter()
+        polling = asyncio.create_task(dp.start_polling(reset_webhook=False))
+        await done.wait()
+        total = time.perf_counter() - started
+
+        dp.stop_polling()
+        await polling
+        if dp.engine is not None:
+            await dp.engine.close()
+        await bot.session.close()
+        await runner.cleanup()
+
+        yield {'bench': 'throughput', 'impl': impl, 'updates': count, 'latency_s': latency,
+               'total_s': total, 'per_second': count / total, 'requests': server.requests,
+               'committed': server.committed}
+
+
+BENCHES = ['throughput']
+
+
+async def run(benches: list[str], options: argparse.Namespace, output=sys.stdout):
+    generators = {
+        'throughput': lambda: bench_throughput(options.updates, options.chats, options.latency,
+                                               options.handler_delay, options.port),
+    }
+
+    for name in benches:
+        async for result in generators[name]():
+            print(json.dumps(result), file=output, flush=True)
+
+
+def main(args: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benches', nargs='*', metavar='bench', help=f'any of: {", ".join(BENCHES)}')
+    parser.add_argument('--updates', type=int, default=5000, help='updates in stream of fake server')
+    parser.add_argument('--chats', type=int, default=100, help='chats which updates are from')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds before fake server answers')
+    parser.add_argument('--handler-delay', type=float, default=0.005, help='seconds of I/O in handler')
+    parser.add_argument('--port', type=int, default=8790, help='port of fake server')
+    options = parser.parse_args(args)
+
+    unknown = set(options.benches) - set(BENCHES)
+    if unknown:
+        parser.error(f'unknown benches: {", ".join(sorted(unknown))}')
+
+    asyncio.run(run(options.benches or BENCHES, options))
+
+
+if __name__ == '__main__':
+    main()
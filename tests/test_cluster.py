@@ -0,0 +1,95 @@
+import asyncio
+import functools
+import os
+import time
+from pathlib import Path
+
+from aiogram import Bot, types
+
+from aiogram_tools import Dispatcher
+from aiogram_tools._cluster import Cluster, get_chat_id
+
+USER = {'id': 1, 'is_bot': False, 'first_name': 'Test'}
+
+
+def make_raw_update(update_id: int, chat_id: int) -> dict:
+    chat = {'id': chat_id, 'type': 'private'}
+    message = {'message_id': update_id, 'date': 0, 'chat': chat, 'from': USER, 'text': str(update_id)}
+    return {'update_id': update_id, 'message': message}
+
+
+def make_dispatcher(output_dir: str) -> Dispatcher:
+    """Factory of workers (module level, so it's picklable): handler appends "pid message_id" to file of chat."""
+    dp = Dispatcher(Bot('1:test', validate_token=False))
+
+    @dp.message_handler()
+    async def handler(message: types.Message):
+        await asyncio.sleep(0.001 * (message.message_id % 5))  # later updates of chat may finish first
+        with open(Path(output_dir, f'{message.chat.id}.txt'), 'a') as file:
+            file.write(f'{os.getpid()} {message.message_id}\n')
+
+    return dp
+
+
+def read_processed(output_dir: Path, chat_id: int) -> list[tuple[int, int]]:
+    path = output_dir / f'{chat_id}.txt'
+    if not path.exists():
+        return []
+    return [tuple(map(int, line.split())) for line in path.read_text().splitlines()]
+
+
+async def wait_for(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timeout'
+        await asyncio.sleep(0.05)
+
+
+def test_get_chat_id():
+    assert get_chat_id(make_raw_update(1, 42)) == 42
+    assert get_chat_id({'update_id': 2, 'callback_query': {'id': '1', 'from': {'id': 7}}}) == 7
+    assert get_chat_id({'update_id': 3, 'poll': {'id': '1'}}) == 3
+
+
+def test_cluster_keeps_order_of_chat_and_restarts_killed_worker(tmp_path):
+    chats = [1, 2, 3, 4]  # hash(chat) % 2: 1 and 3 go to worker 1, 2 and 4 to worker 0
+    per_chat = 20
+
+    async def main():
+        cluster = Cluster(functools.partial(make_dispatcher, str(tmp_path)), 2, workers=4,
+                          stats_interval=0.1, restart_delay=0.1)
+        cluster.start()
+        try:
+            updates = [make_raw_update(i * len(chats) + n, chat) for i in range(per_chat)
+                       for n, chat in enumerate(chats)]
+            await cluster.route(updates[:len(updates) // 2])
+            await cluster.route(updates[len(updates) // 2:])
+            await wait_for(lambda: all(len(read_processed(tmp_path, chat)) == per_chat for chat in chats))
+
+            assert cluster.stats.received == len(updates)
+            assert cluster.stats.routed == [per_chat * 2, per_chat * 2]
+            for chat in chats:
+                processed = read_processed(tmp_path, chat)
+                expected = [update['update_id'] for update in updates if get_chat_id(update) == chat]
+                assert [message_id for _, message_id in processed] == expected
+                assert {pid for pid, _ in processed} == {cluster._workers[chat % 2].process.pid}
+
+            await wait_for(lambda: all(stats.get('processed') == per_chat * 2 for stats in cluster.stats.workers))
+            assert cluster.stats.aggregate()['processed'] == len(updates)
+
+            killed = cluster._workers[0].process
+            killed.kill()
+            await wait_for(lambda: cluster.stats.restarts == 1 and cluster._workers[0].process is not killed)
+            restarted = cluster._workers[0].process
+            assert restarted.is_alive()
+            assert not killed.is_alive()
+
+            await cluster.route([make_raw_update(1000, 2)])
+            await wait_for(lambda: len(read_processed(tmp_path, 2)) == per_chat + 1)
+            assert read_processed(tmp_path, 2)[-1] == (restarted.pid, 1000)
+        finally:
+            await cluster.close(timeout=10)
+
+        assert not any(worker.process.is_alive() for worker in cluster._workers)
+
+    asyncio.run(main())
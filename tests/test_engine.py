@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+from aiogram import Bot, types
+from aiogram.dispatcher.webhook import BOT_DISPATCHER_KEY, SendMessage
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from aiogram_tools import Dispatcher
+from aiogram_tools._engine import UpdateIdWindow, FastAckRequestHandler
+
+USER = {'id': 1, 'is_bot': False, 'first_name': 'Test'}
+
+
+def make_update(update_id: int, chat_id: int = 1, date: int = 0) -> types.Update:
+    chat = {'id': chat_id, 'type': 'private'}
+    message = {'message_id': update_id, 'date': date, 'chat': chat, 'from': USER, 'text': str(update_id)}
+    return types.Update(update_id=update_id, message=message)
+
+
+def make_dispatcher(**engine_kwargs) -> tuple[Dispatcher, list[int]]:
+    bot = Bot('1:test', validate_token=False)
+    dp = Dispatcher(bot)
+    dp.setup_engine(**engine_kwargs)
+    processed = []
+
+    @dp.message_handler()
+    async def handler(message: types.Message):
+        await asyncio.sleep(0.01)
+        processed.append(message.message_id)
+        return message.message_id
+
+    return dp, processed
+
+
+def test_process_updates_keeps_order_of_chat():
+    async def main():
+        dp, processed = make_dispatcher(workers=1, queue_size=1)
+        first = asyncio.create_task(dp.process_updates([make_update(i) for i in (1, 2, 3)]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(dp.process_updates([make_update(4)]))
+
+        results = await asyncio.gather(first, second)
+        await dp.engine.close()
+        await dp.bot.session.close()
+        return processed, results
+
+    processed, results = asyncio.run(main())
+    assert processed == [1, 2, 3, 4]
+    assert results == [[[[1]], [[2]], [[3]]], [[[4]]]]  # same shape as without engine
+
+
+def test_polling_hands_off_batch_before_next_request():
+    async def main():
+        dp, processed = make_dispatcher(workers=1, queue_size=1)
+        batches = [[make_update(i) for i in (1, 2, 3)], [make_update(4)]]
+        requests = []
+
+        async def get_updates(offset=None, limit=None, timeout=None, **_):
+            requests.append(offset)
+            if batches:
+                return batches.pop(0)
+            dp.stop_polling()
+            return []
+
+        dp.bot.get_updates = get_updates
+        await dp.start_polling(relax=0, reset_webhook=False)
+        await dp.engine.close()
+        await dp.bot.session.close()
+        return processed, requests
+
+    processed, requests = asyncio.run(main())
+    assert processed == [1, 2, 3, 4]
+    assert requests == [None, 4, 5]
+
+
+def test_update_id_window():
+    window = UpdateIdWindow(size=8)
+    assert window.add(100)
+    assert not window.add(100)
+    assert window.add(95) and window.add(107)
+    assert not window.add(95)
+    assert not window.add(99)  # older than window is considered seen
+    assert window.add(120)
+    assert not window.add(107)  # window moved past it
+
+
+def make_webhook_client(dp: Dispatcher) -> TestClient:
+    app = web.Application()
+    app[BOT_DISPATCHER_KEY] = dp
+    app.router.add_route('*', '/webhook', FastAckRequestHandler)
+    return TestClient(TestServer(app))
+
+
+def test_fast_ack_answers_before_slow_handler():
+    async def main():
+        dp = Dispatcher(Bot('1:test', validate_token=False))
+        dp.setup_engine(dedup_window=16)
+        processed = []
+
+        @dp.message_handler()
+        async def handler(message: types.Message):
+            await asyncio.sleep(0.3)
+            processed.append(message.message_id)
+            return SendMessage(message.chat.id, 'answer')
+
+        async with make_webhook_client(dp) as client:
+            started = time.monotonic()
+            response = await client.post('/webhook', json=make_update(1).to_python())
+            answer_time = time.monotonic() - started
+            text = await response.text()
+            processed_on_answer = list(processed)
+
+            await dp.engine.close()
+        await dp.bot.session.close()
+        return response.status, text, answer_time, processed_on_answer, processed
+
+    status, text, answer_time, processed_on_answer, processed = asyncio.run(main())
+    assert (status, text) == (200, 'ok')
+    assert answer_time < 0.2
+    assert processed_on_answer == []
+    assert processed == [1]
+
+
+def test_fast_ack_skips_redelivered_updates():
+    async def main():
+        dp = Dispatcher(Bot('1:test', validate_token=False))
+        dp.setup_engine(dedup_window=4)
+        processed = []
+
+        @dp.message_handler()
+        async def handler(message: types.Message):
+            processed.append(message.message_id)
+
+        async with make_webhook_client(dp) as client:
+            for update_id in (10, 11, 10, 20, 11, 15, 20):
+                response = await client.post('/webhook', json=make_update(update_id).to_python())
+                assert response.status == 200
+            await dp.engine.close()
+        await dp.bot.session.close()
+        return processed, dp.engine.stats
+
+    processed, stats = asyncio.run(main())
+    assert processed == [10, 11, 20]  # 15 is older than window after 20
+    assert stats.duplicates == 4
+    assert stats.processed == 3
+
+
+def test_lag_stats_count_dated_updates():
+    async def main():
+        dp, _ = make_dispatcher(workers=2)
+        old_message = make_update(1, date=int(time.time()) - 5)
+        callback = types.Update(update_id=2, callback_query={'id': '1', 'from': USER, 'chat_instance': '1',
+                                                              'data': 'x'})
+
+        await dp.engine.put(old_message)
+        await dp.engine.put(callback)
+        await dp.engine.close()
+        await dp.bot.session.close()
+        return dp.engine.stats
+
+    stats = asyncio.run(main())
+    assert stats.processed == 2
+    assert stats.dated == 1
+    assert 4 <= stats.avg_lag < 7  # date has precision of second
+    assert stats.max_lag == stats.avg_lag
+    assert stats.max_latency >= 0.01
@@ -0,0 +1,118 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from aiogram import Bot, types
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+
+from aiogram_tools import Dispatcher
+
+USER = {'id': 1, 'is_bot': False, 'first_name': 'Test'}
+
+
+class CountingStorage(MemoryStorage):
+    """MemoryStorage which counts calls of its methods."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    def __getattribute__(self, name):
+        attr = super().__getattribute__(name)
+        if name not in ('get_state', 'get_data', 'set_state', 'set_data', 'update_data', 'get_record', 'set_record'):
+            return attr
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+class RecordStorage(CountingStorage):
+    """Storage with one record per address (like RedisStorage)."""
+
+    async def get_record(self, *, chat=None, user=None) -> dict:
+        chat, user = self.resolve_address(chat=chat, user=user)
+        return {'state': self.data[chat][user]['state'], 'data': self.data[chat][user]['data'],
+                'bucket': self.data[chat][user].get('bucket')}
+
+    async def set_record(self, *, chat=None, user=None, state=None, data=None, bucket=None):
+        chat, user = self.resolve_address(chat=chat, user=user)
+        self.data[chat][user].update(state=state, data=data or {}, bucket=bucket)
+
+
+def make_update(text: str) -> types.Update:
+    message = {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'from': USER, 'text': text}
+    return types.Update(update_id=1, message=message)
+
+
+def process(storage: MemoryStorage, handler, text: str = 'x'):
+    async def main():
+        await storage.set_state(chat=1, user=1, state='old')
+        await storage.set_data(chat=1, user=1, data={'a': 1, 'b': 2})
+        storage.calls.clear()
+
+        dp = Dispatcher(Bot('1:test', validate_token=False), storage=storage, fsm_unit_of_work=True)
+
+        async def handle(_):
+            return await handler(dp.current_state())
+
+        dp.register_message_handler(handle, state='*')
+        try:
+            await dp.process_update(make_update(text))
+        finally:
+            await dp.bot.session.close()
+        return await storage.get_state(chat=1, user=1), await storage.get_data(chat=1, user=1)
+
+    return asyncio.run(main())
+
+
+def test_reads_are_served_from_memory():
+    async def handler(state):
+        for _ in range(3):
+            assert await state.get_state() == 'old'
+            assert await state.get_data() == {'a': 1, 'b': 2}
+
+    storage = CountingStorage()
+    process(storage, handler)
+    assert storage.calls == {'get_state': 2, 'get_data': 2}  # one by context, one by test
+
+
+def test_changes_are_flushed_once():
+    async def handler(state):
+        await state.update_data(a=10)
+        await state.update_data(c=3)
+        await state.set_state('new')
+        await state.set_state('newer')
+
+    storage = CountingStorage()
+    assert process(storage, handler) == ('newer', {'a': 10, 'b': 2, 'c': 3})
+    assert storage.calls['set_state'] == 1
+    assert storage.calls['update_data'] == 1
+    assert storage.calls['set_data'] == 0
+
+
+def test_state_and_data_are_one_record_write():
+    async def handler(state):
+        await state.update_data(a=10)
+        await state.set_state('new')
+
+    storage = RecordStorage()
+    assert process(storage, handler) == ('new', {'a': 10, 'b': 2})
+    assert storage.calls['set_record'] == 1
+    assert storage.calls['set_state'] == storage.calls['update_data'] == 0
+
+
+def test_changes_are_discarded_on_exception():
+    async def handler(state):
+        await state.update_data(a=10)
+        await state.set_state('new')
+        raise RuntimeError('handler failed')
+
+    storage = CountingStorage()
+    with pytest.raises(RuntimeError):
+        process(storage, handler)
+    assert asyncio.run(storage.get_state(chat=1, user=1)) == 'old'
+    assert asyncio.run(storage.get_data(chat=1, user=1)) == {'a': 1, 'b': 2}
+    assert storage.calls['set_state'] == storage.calls['update_data'] == 0
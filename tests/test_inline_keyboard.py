@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import InlineKeyboardButton
+from aiogram.utils.payload import prepare_arg
+
+from aiogram_tools._inline_keyboard import InlineKeyboard, SerializedMarkup
+
+
+class Keyboard(InlineKeyboard):
+    DATA_ROWS = [(SimpleNamespace(value='YES'), SimpleNamespace(value='NO')), SimpleNamespace(value='BACK')]
+
+
+BUTTONS = {'yes': 'Yes', 'no': 'No', 'back': 'Back'}
+
+
+def test_cached_keyboard_is_shared_and_frozen():
+    keyboard = Keyboard.cached(BUTTONS)
+    assert Keyboard.cached(dict(reversed(BUTTONS.items()))) is keyboard
+
+    with pytest.raises(RuntimeError):
+        keyboard.add(InlineKeyboardButton('More', callback_data='MORE'))
+
+    copy = keyboard.copy()
+    copy.add(InlineKeyboardButton('More', callback_data='MORE'))
+    assert len(copy.inline_keyboard) == 3
+    assert len(keyboard.inline_keyboard) == 2
+
+
+def test_to_python_of_cached_keyboard_returns_copy():
+    keyboard = Keyboard.cached(BUTTONS)
+    markup = keyboard.to_python()
+    markup['inline_keyboard'][0][0]['text'] = 'Changed'
+    markup['inline_keyboard'].append([])
+
+    assert keyboard.to_python() == Keyboard(BUTTONS).to_python()
+    assert json.loads(keyboard.serialized) == Keyboard(BUTTONS).to_python()
+
+
+def test_serialized_is_computed_once():
+    keyboard = Keyboard.cached(BUTTONS)
+    serialized = keyboard.serialized
+
+    assert isinstance(serialized, SerializedMarkup)
+    assert keyboard.serialized is serialized
+    assert prepare_arg(serialized) is serialized
+    assert json.loads(prepare_arg(keyboard)) == json.loads(serialized)
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from aiogram_tools._models import DataModel, MongoModel, with_slots
+
+
+@dataclass
+class Address(DataModel):
+    city: str = ''
+    tags: list[str] = field(default_factory=list)
+
+
+@dataclass
+class User(MongoModel):
+    name: str = ''
+    address: Optional[Address] = None
+    addresses: list[Address] = field(default_factory=list)
+    friend: Optional[Unknown] = None  # noqa: F821 - unresolvable forward reference
+
+
+@with_slots
+@dataclass
+class Point(DataModel):
+    x: int = 0
+    y: int = 0
+
+
+def test_round_trip():
+    user = User(name='Bob', address=Address('Paris', ['a']), addresses=[Address('Rome')], _id=1)
+    data = user.to_dict()
+    assert data == {'name': 'Bob', 'address': {'city': 'Paris', 'tags': ['a']},
+                    'addresses': [{'city': 'Rome', 'tags': []}], 'friend': None, '_id': 1}
+    assert User.from_dict({**data, 'unknown': 1}) == user
+
+
+def test_bad_forward_reference_keeps_other_fields_decoded():
+    user = User.from_dict({'address': {'city': 'Paris'}, 'addresses': [{'city': 'Rome'}], 'friend': {'x': 1}})
+    assert user.address == Address('Paris')
+    assert user.addresses == [Address('Rome')]
+    assert user.friend == {'x': 1}
+
+
+def test_to_dict_copies_values():
+    tags = ['a']
+    address = Address('Paris', tags)
+    assert address.to_dict()['tags'] is not tags
+
+    address = Address(['not', 'str'])  # annotation isn't checked
+    assert address.to_dict()['city'] == ['not', 'str']
+    assert address.to_dict()['city'] is not address.city
+
+
+def test_slots():
+    point = Point(1, 2)
+    assert not hasattr(point, '__dict__')
+    assert Point.from_dict(point.to_dict()) == point
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher import FSMContext
+
+from aiogram_tools._operations import Operation, apply_to_dict, apply_operations, to_mongo_updates
+
+OPERATIONS = [
+    Operation('set', 'name', 'Bob'),
+    Operation('push', 'tags', ['a', 'b']),
+    Operation('pull', 'items', [1, 3]),
+    Operation('unset', 'old'),
+]
+DATA = {'items': [1, 2, 1, 3, 3], 'old': 1, 'other': {'x': 1}}
+EXPECTED = {'name': 'Bob', 'tags': ['a', 'b'], 'items': [2, 1, 3], 'other': {'x': 1}}
+
+
+def test_apply_to_dict():
+    data = {**DATA, 'items': list(DATA['items'])}
+    changed = apply_to_dict(data, OPERATIONS)
+    assert data == EXPECTED
+    assert changed == {'name', 'tags', 'items'}
+
+
+def test_pull_removes_one_occurrence_and_ignores_missing():
+    data = {'items': [1, 1, 2]}
+    apply_to_dict(data, [Operation('pull', 'items', [1, 5]), Operation('pull', 'missing', [1])])
+    assert data == {'items': [1, 2]}
+
+
+@pytest.mark.parametrize('op', ['push', 'pull'])
+def test_list_operations_on_not_list_raise(op):
+    with pytest.raises(TypeError):
+        apply_to_dict({'name': 'Bob'}, [Operation(op, 'name', ['x'])])
+
+
+def test_to_mongo_updates_merges_operations_on_key():
+    operations = [
+        Operation('set', 'a', [1]), Operation('push', 'a', [2]),
+        Operation('push', 'b', [1]), Operation('push', 'b', [2]),
+        Operation('unset', 'c'), Operation('push', 'c', [1]),
+        Operation('set', 'd', 1), Operation('unset', 'd'),
+    ]
+    assert to_mongo_updates(operations, prefix='data.') == [{
+        '$set': {'data.a': [1, 2], 'data.c': [1]},
+        '$push': {'data.b': {'$each': [1, 2]}},
+        '$unset': {'data.d': ''},
+    }]
+
+
+def test_to_mongo_updates_rejects_pull():
+    with pytest.raises(ValueError):
+        to_mongo_updates([Operation('pull', 'items', [1])])
+
+
+def test_fallback_on_memory_storage():
+    async def main():
+        storage = MemoryStorage()
+        await storage.set_data(chat=1, user=1, data=DATA)
+        await apply_operations(FSMContext(storage, 1, 1), OPERATIONS)
+        return await storage.get_data(chat=1, user=1)
+
+    assert asyncio.run(main()) == EXPECTED
+
+
+class AsyncCollection:
+    """Async facade of mongomock collection (as motor collection)."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+def make_mongo_storage():
+    mongomock = pytest.importorskip('mongomock')
+    pytest.importorskip('motor')
+    from aiogram_tools._mongo_storage import MongoStorage
+
+    db = mongomock.MongoClient().db
+    storage = MongoStorage()
+
+    async def get_db():
+        return {name: AsyncCollection(db[name]) for name in ('aiogram_state', 'aiogram_data', 'aiogram_bucket')}
+
+    storage.get_db = get_db
+    return storage, db
+
+
+@pytest.mark.parametrize('key', ['plain', 'with.dot', '$dollar'])
+def test_mongo_storage_keeps_keys_flat(key):
+    storage, db = make_mongo_storage()
+
+    async def main():
+        await storage.set_data(chat=1, user=1, data={'a': 1})
+        await storage.update_data(chat=1, user=1, data={key: 2})
+        return await storage.get_data(chat=1, user=1)
+
+    assert asyncio.run(main()) == {'a': 1, key: 2}
+
+
+def test_mongo_storage_matches_fallback():
+    storage, db = make_mongo_storage()
+
+    async def main():
+        await storage.set_data(chat=1, user=1, data=DATA)
+        await storage.apply_operations(chat=1, user=1, operations=OPERATIONS)
+        without_pull = [operation for operation in OPERATIONS if operation.op != 'pull']
+        await storage.apply_operations(chat=1, user=1, operations=without_pull)
+        return await storage.get_data(chat=1, user=1)
+
+    expected = {**EXPECTED, 'tags': ['a', 'b', 'a', 'b']}
+    assert asyncio.run(main()) == expected
+
+
+def test_mongo_storage_updates_atomically():
+    storage, db = make_mongo_storage()
+    operations = [Operation('set', 'name', 'Bob'), Operation('push', 'tags', ['a']), Operation('unset', 'old')]
+
+    async def main():
+        await storage.set_data(chat=1, user=1, data={'old': 1})
+        storage.get_data = None  # no read-modify-write
+        await storage.apply_operations(chat=1, user=1, operations=operations)
+
+    asyncio.run(main())
+    assert db['aiogram_data'].find_one({'chat': 1, 'user': 1})['data'] == {'name': 'Bob', 'tags': ['a']}
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram import types
+from pymongo import InsertOne, ReplaceOne, DeleteOne
+
+from aiogram_tools._models import MongoModel
+from aiogram_tools._repository import MongoRepository
+
+
+@dataclass
+class User(MongoModel):
+    name: str = ''
+    age: int = 0
+
+
+class InMemoryCollection:
+    """Stand-in for pymongo Collection: equality and $in filters, projection, bulk_write of basic operations."""
+
+    name = 'users'
+
+    def __init__(self, *documents: dict):
+        self.documents = {document['_id']: dict(document) for document in documents}
+        self.queries: list[dict] = []
+        self.bulk_writes: list[list] = []
+        self.threads: set[str] = set()
+
+    @staticmethod
+    def _matches(document: dict, filter: dict) -> bool:
+        for key, condition in filter.items():
+            if isinstance(condition, dict) and '$in' in condition:
+                if document.get(key) not in condition['$in']:
+                    return False
+            elif document.get(key) != condition:
+                return False
+        return True
+
+    @staticmethod
+    def _project(document: dict, projection: Optional[dict]) -> dict:
+        if not projection:
+            return dict(document)
+        return {key: value for key, value in document.items() if key == '_id' or projection.get(key)}
+
+    def find(self, filter: dict, projection: Optional[dict] = None, skip: int = 0, limit: int = 0, sort=None):
+        self.threads.add(threading.current_thread().name)
+        self.queries.append(filter)
+        found = [self._project(document, projection) for document in self.documents.values()
+                 if self._matches(document, filter)]
+        found = found[skip:]
+        return found[:limit] if limit else found
+
+    def find_one(self, filter: dict, projection: Optional[dict] = None):
+        found = self.find(filter, projection, limit=1)
+        return found[0] if found else None
+
+    def bulk_write(self, operations: list, ordered: bool = True):
+        self.bulk_writes.append(operations)
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                self.documents[operation._doc['_id']] = dict(operation._doc)
+            elif isinstance(operation, ReplaceOne):
+                self.documents[operation._filter['_id']] = {**operation._doc, '_id': operation._filter['_id']}
+            elif isinstance(operation, DeleteOne):
+                self.documents.pop(operation._filter['_id'], None)
+
+
+def run_in_update(main):
+    async def run():
+        types.Update.set_current(types.Update(update_id=1))
+        return await main()
+
+    return asyncio.run(run())
+
+
+def make_repository(*documents: dict) -> tuple[MongoRepository[User], InMemoryCollection]:
+    collection = InMemoryCollection(*documents)
+    return MongoRepository(collection, User), collection
+
+
+def test_get_uses_identity_map_and_thread_pool():
+    repository, collection = make_repository({'_id': 1, 'name': 'a', 'age': 1, 'extra': 'x'})
+
+    async def main():
+        return await repository.get(1), await repository.get(1)
+
+    first, second = run_in_update(main)
+    assert first is second
+    assert first == User(name='a', age=1, _id=1)
+    assert len(collection.queries) == 1
+    assert all(name.startswith('users_repo') for name in collection.threads)
+
+
+def test_identity_map_is_per_update():
+    repository, collection = make_repository({'_id': 1, 'name': 'a'})
+
+    async def main():
+        first = await repository.get(1)
+        types.Update.set_current(types.Update(update_id=2))
+        return first, await repository.get(1)
+
+    first, second = run_in_update(main)
+    assert first is not second
+    assert len(collection.queries) == 2
+
+
+def test_find_keeps_loaded_models():
+    repository, _ = make_repository({'_id': 1, 'name': 'a', 'age': 1}, {'_id': 2, 'name': 'b', 'age': 1})
+
+    async def main():
+        user = await repository.get(1)
+        user.name = 'changed'
+        found = await repository.find({'age': 1})
+        many = await repository.get_many([1, 2])
+        return user, found, many, await repository.get(1)
+
+    user, found, many, again = run_in_update(main)
+    assert found[0] is user and many[1] is user and again is user
+    assert user.name == 'changed'
+    assert found[1] is many[2]
+
+
+def test_get_many_queries_missing_only():
+    repository, collection = make_repository({'_id': 1, 'name': 'a'}, {'_id': 2, 'name': 'b'})
+
+    async def main():
+        await repository.get(1)
+        return await repository.get_many([1, 2, 3])
+
+    found = run_in_update(main)
+    assert sorted(found) == [1, 2]
+    assert collection.queries[-1] == {'_id': {'$in': [2, 3]}}
+
+
+def test_batch_sends_one_bulk_write():
+    repository, collection = make_repository({'_id': 1, 'name': 'a'})
+
+    async def main():
+        user = await repository.get(1)
+        user.name = 'b'
+        new_user = User(name='new')
+        async with repository.batch():
+            await repository.save(user, new_user)
+            await repository.delete(1)
+            assert not collection.bulk_writes
+        return new_user
+
+    new_user = run_in_update(main)
+    assert len(collection.bulk_writes) == 1
+    assert [type(operation) for operation in collection.bulk_writes[0]] == [ReplaceOne, InsertOne, DeleteOne]
+    assert list(collection.documents) == [new_user._id]
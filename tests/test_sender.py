@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+from aiogram.bot.api import TelegramAPIServer
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from aiogram_tools._bot import Bot
+from aiogram_tools._sender import SendScheduler, Priority
+
+
+class FakeBotAPI:
+    """Bot API server which records sent messages and answers RetryAfter to first `flood` of them."""
+
+    def __init__(self, flood: int = 0, retry_after: int = 1):
+        self.flood = flood
+        self.retry_after = retry_after
+        self.sent: list[tuple[float, int, str]] = []  # (time, chat_id, text)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        data = dict(await request.post())
+        if self.flood:
+            self.flood -= 1
+            return web.json_response({'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                      'parameters': {'retry_after': self.retry_after}}, status=429)
+
+        chat_id = int(data['chat_id'])
+        self.sent.append((time.monotonic(), chat_id, data['text']))
+        message = {'message_id': len(self.sent), 'date': 0, 'chat': {'id': chat_id, 'type': 'private'},
+                   'text': data['text']}
+        return web.json_response({'ok': True, 'result': message})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+
+def run_with_bot(api: FakeBotAPI, scheduler: SendScheduler, main):
+    async def run():
+        async with TestServer(api.make_app()) as server:
+            bot = Bot('1:test', validate_token=False, send_scheduler=scheduler,
+                      server=TelegramAPIServer.from_base(str(server.make_url('')).rstrip('/')))
+            try:
+                return await main(bot)
+            finally:
+                await scheduler.close()
+                await bot.session.close()
+
+    return asyncio.run(run())
+
+
+def test_chat_rate_limit_and_order():
+    api = FakeBotAPI()
+
+    async def main(bot):
+        await asyncio.gather(*(bot.send_message(1, str(i)) for i in range(4)))
+
+    run_with_bot(api, SendScheduler(global_rate=100, chat_rate=10), main)
+
+    assert [text for _, _, text in api.sent] == ['0', '1', '2', '3']
+    assert api.sent[-1][0] - api.sent[0][0] >= 0.25  # 10 per second
+
+
+def test_global_rate_limit():
+    api = FakeBotAPI()
+
+    async def main(bot):
+        started = time.monotonic()
+        await asyncio.gather(*(bot.send_message(chat_id, 'x') for chat_id in range(1, 31)))
+        return time.monotonic() - started
+
+    total = run_with_bot(api, SendScheduler(global_rate=20, chat_rate=10), main)
+
+    assert len(api.sent) == 30
+    assert total >= 0.45  # burst of 20 requests, then 10 more at 20 per second
+
+
+def test_priority_does_not_reorder_chat():
+    api = FakeBotAPI()
+
+    async def main(bot):
+        with SendScheduler.priority(Priority.BULK):  # tasks copy context with priority
+            bulk = [asyncio.create_task(bot.send_message(1, f'bulk{i}')) for i in range(2)]
+        await asyncio.sleep(0)
+        with SendScheduler.priority(Priority.INTERACTIVE):
+            await asyncio.gather(*bulk, bot.send_message(1, 'interactive'), bot.send_message(2, 'other chat'))
+
+    run_with_bot(api, SendScheduler(global_rate=100, chat_rate=10), main)
+
+    chat_1 = [text for _, chat_id, text in api.sent if chat_id == 1]
+    assert chat_1 == ['bulk0', 'bulk1', 'interactive']
+    assert [text for _, _, text in api.sent].index('other chat') < 2  # other chat isn't waiting for chat 1
+
+
+def test_retry_after_pauses_chat_and_retries():
+    api = FakeBotAPI(flood=1)
+    scheduler = SendScheduler(global_rate=100, chat_rate=10)
+
+    async def main(bot):
+        started = time.monotonic()
+        messages = await asyncio.gather(bot.send_message(1, 'a'), bot.send_message(1, 'b'))
+        return messages, time.monotonic() - started
+
+    messages, total = run_with_bot(api, scheduler, main)
+
+    assert [message.text for message in messages] == ['a', 'b']
+    assert [text for _, _, text in api.sent] == ['a', 'b']
+    assert total >= 1
+    assert scheduler.stats.retry_after == 1
+    assert scheduler.stats.sent == 2
+
+
+def test_close_waits_for_requests():
+    api = FakeBotAPI()
+    scheduler = SendScheduler(global_rate=100, chat_rate=10)
+
+    async def main(bot):
+        for i in range(3):
+            asyncio.create_task(bot.send_message(1, str(i)))
+        await asyncio.sleep(0)
+        await scheduler.close()
+        return scheduler.queue_depth, scheduler.in_flight
+
+    assert run_with_bot(api, scheduler, main) == (0, 0)
+    assert len(api.sent) == 3